@@ -1,7 +1,7 @@
 """配置管理 - Acme Controller"""
 
 import os
-from functools import lru_cache
+from functools import cached_property, lru_cache
 from pydantic_settings import BaseSettings
 
 
@@ -14,11 +14,28 @@ class Settings(BaseSettings):
     
     port: int = 3000
     reload: bool = os.getenv("RELOAD", "false").lower() == "true"
+    # worker 行程數，預設 1 (reload 模式下固定為 1)
+    # 容器內 os.cpu_count() 回傳的是主機核心數而非容器的 CPU 配額，因此不以其作為預設值；
+    # 需要多 worker 時依容器實際可用的 CPU 設定 WEB_CONCURRENCY
+    workers: int = int(os.getenv("WEB_CONCURRENCY", "1"))
     runmode: str = os.getenv("RUNMODE", "docker")
+    # 允許跨來源呼叫 API 的前端來源 (逗號分隔)，預設為 Vite dev server
+    cors_origins: str = os.getenv("CORS_ORIGINS", "http://localhost:5173")
+    # 整個 Controller (所有 worker 合計) 同時進行中的高成本 ACA-Py/Ledger 操作上限
+    ledger_concurrency: int = int(os.getenv("LEDGER_CONCURRENCY", "16"))
     
     @property
+    def ledger_concurrency_per_worker(self) -> int:
+        """
+        每個 worker 的高成本操作上限
+        semaphore 只在單一行程內有效，因此將總上限平均分給各 worker (至少 1)
+        """
+        workers = 1 if self.reload else self.workers
+        return max(1, self.ledger_concurrency // workers)
+    
+    @cached_property
     def acme_agent_url(self) -> str:
-        """構建 Acme Agent 的完整 URL"""
+        """構建 Acme Agent 的完整 URL (只組一次)"""
         return f"http://{self.acme_agent_host}:{self.acme_agent_port}"
     
     class Config:
@@ -4,24 +4,30 @@ Acme 作為 Verifier，需要與 Alice (Holder) 建立連線
 """
 
 import logging
-from typing import Any, Dict
-from fastapi import APIRouter, HTTPException
-from pydantic import BaseModel
+from typing import Any, Dict, List
+import orjson
+from fastapi import APIRouter, Depends, HTTPException
+from pydantic import BaseModel, TypeAdapter
 
 from aries_cloudcontroller import AcaPyClient
 from aries_cloudcontroller.models import (
     InvitationCreateRequest,
     InvitationMessage,
+    ConnRecord,
 )
 
+from routes import get_client
+from routes.cache import invalidate, list_cache
+from routes.serializers import dump_model, dump_results, json_response
+
 logger = logging.getLogger(__name__)
 router = APIRouter()
 
-
-def get_client() -> AcaPyClient:
-    """取得 ACA-Py 客戶端"""
-    from main import get_acapy_client
-    return get_acapy_client()
+_CONN_RECORDS = TypeAdapter(List[ConnRecord])
+# ConnRecord.to_dict() 會排除 readOnly 欄位 rfc23_state，序列化時保持一致
+_CONN_EXCLUDE = {"__all__": {"rfc23_state"}}
+# 缺少外層大括號的邀請字串開頭
+_BRACELESS_PREFIXES = ('"@type"', '"@id"')
 
 
 class InvitationAcceptRequest(BaseModel):
@@ -30,88 +36,84 @@ class InvitationAcceptRequest(BaseModel):
 
 
 @router.get("/connections")
-async def get_connections():
+async def get_connections(client: AcaPyClient = Depends(get_client)):
     """取得所有連線列表"""
+    cached = list_cache.get("connections")
+    if cached is not None:
+        return json_response(cached)
+    
     try:
-        client = get_client()
         connections = await client.connection.get_connections()
         
-        return {
-            "results": [conn.to_dict() for conn in connections.results] if connections.results else []
-        }
+        body = dump_results(_CONN_RECORDS, connections.results, exclude=_CONN_EXCLUDE)
+        list_cache["connections"] = body
+        return json_response(body)
     except Exception as e:
-        logger.error(f"Failed to get connections: {e}")
+        logger.error("Failed to get connections: %s", e)
         return {"results": []}
 
 
 @router.post("/connections/invitation")
-async def create_invitation():
+async def create_invitation(client: AcaPyClient = Depends(get_client)):
     """創建邀請 (Acme 邀請 Alice 時使用，但通常是 Alice 邀請 Acme)"""
     try:
-        client = get_client()
-        
         result = await client.out_of_band.create_invitation(
             body=InvitationCreateRequest(
                 handshake_protocols=["https://didcomm.org/didexchange/1.1"]
             )
         )
+        invalidate("connections")
         
         # 返回 invitation 物件
-        if hasattr(result, 'invitation') and result.invitation:
-            return result.invitation.to_dict()
-        return result.to_dict()
+        if result.invitation:
+            return json_response(dump_model(result.invitation))
+        return json_response(dump_model(result))
         
     except Exception as e:
-        logger.error(f"Failed to create invitation: {e}")
+        logger.error("Failed to create invitation: %s", e)
         raise HTTPException(status_code=500, detail=str(e))
 
 
 @router.post("/connections/accept")
-async def accept_invitation(request: InvitationAcceptRequest):
+async def accept_invitation(request: InvitationAcceptRequest, client: AcaPyClient = Depends(get_client)):
     """接受邀請 (Acme 接受 Alice 的邀請)"""
     try:
-        client = get_client()
-        
         invitation_data = request.invitation
         
-        # 如果是字串，嘗試解析 JSON
-        if isinstance(invitation_data, str):
-            import json
-            import re
-            
-            # 清理字串：移除多餘的空白和換行
-            invitation_data = invitation_data.strip()
-            
-            # 如果字串不是以 { 開頭，嘗試修復（可能是缺少外層大括號）
-            if not invitation_data.startswith('{'):
-                # 嘗試添加外層大括號
-                if invitation_data.startswith('"@type"') or invitation_data.startswith('"@id"'):
+        # 常見情況：前端直接送出 JSON 物件，略過所有字串處理
+        if not isinstance(invitation_data, dict):
+            # 正常的 JSON 字串以 { 開頭 (前後空白 JSON 解析器可容忍)，只有其他情況才清理並嘗試修復
+            if invitation_data[:1] != '{':
+                invitation_data = invitation_data.strip()
+                # 可能是缺少外層大括號
+                if invitation_data.startswith(_BRACELESS_PREFIXES):
                     invitation_data = '{' + invitation_data + '}'
                     logger.warning("Fixed invitation JSON by adding outer braces")
             
             try:
-                invitation_data = json.loads(invitation_data)
-            except json.JSONDecodeError as json_err:
-                logger.error(f"JSON parse error: {json_err}")
-                logger.error(f"Invitation string: {invitation_data[:200]}...")
+                invitation_data = orjson.loads(invitation_data)
+            except orjson.JSONDecodeError as json_err:
+                logger.error("JSON parse error: %s", json_err)
+                logger.error("Invitation string: %s...", invitation_data[:200])
                 raise HTTPException(
                     status_code=400,
                     detail=f"Failed to parse invitation JSON: {str(json_err)}. Please ensure the JSON is valid."
                 )
-        
-        # 驗證 invitation_data 是字典
-        if not isinstance(invitation_data, dict):
-            raise HTTPException(
-                status_code=400,
-                detail=f"Invalid invitation format: expected dict, got {type(invitation_data).__name__}"
-            )
+            
+            # 驗證 invitation_data 是字典
+            if not isinstance(invitation_data, dict):
+                raise HTTPException(
+                    status_code=400,
+                    detail=f"Invalid invitation format: expected dict, got {type(invitation_data).__name__}"
+                )
         
         # 轉換為 InvitationMessage
         try:
             invitation_msg = InvitationMessage.from_dict(invitation_data)
         except Exception as model_err:
-            logger.error(f"Failed to create InvitationMessage: {model_err}")
-            logger.error(f"Invitation data: {invitation_data}")
+            logger.error("Failed to create InvitationMessage: %s", model_err)
+            if logger.isEnabledFor(logging.ERROR):
+                logger.error("Invitation data: %s", invitation_data)
             raise HTTPException(
                 status_code=400,
                 detail=f"Invalid invitation format: {str(model_err)}"
@@ -120,32 +122,30 @@ async def accept_invitation(request: InvitationAcceptRequest):
         result = await client.out_of_band.receive_invitation(
             body=invitation_msg
         )
+        invalidate("connections")
         
-        connection_id = None
-        if hasattr(result, 'connection_id'):
-            connection_id = result.connection_id
+        connection_id = result.connection_id
         
-        logger.info(f"✓ Invitation accepted successfully, connection_id: {connection_id}")
+        logger.info("✓ Invitation accepted successfully, connection_id: %s", connection_id)
         return {"ok": True, "connection_id": connection_id}
         
     except HTTPException:
         # 重新拋出 HTTPException
         raise
     except Exception as e:
-        logger.error(f"Failed to accept invitation: {e}", exc_info=True)
+        logger.error("Failed to accept invitation: %s", e, exc_info=True)
         raise HTTPException(status_code=400, detail=f"Failed to accept invitation: {str(e)}")
 
 
 @router.delete("/connections/{connection_id}")
-async def remove_connection(connection_id: str):
+async def remove_connection(connection_id: str, client: AcaPyClient = Depends(get_client)):
     """移除連線"""
     try:
-        client = get_client()
-        
         await client.connection.delete_connection(conn_id=connection_id)
+        invalidate("connections")
         
         return {"status": "removed"}
         
     except Exception as e:
-        logger.error(f"Failed to remove connection {connection_id}: {e}")
+        logger.error("Failed to remove connection %s: %s", connection_id, e)
         raise HTTPException(status_code=500, detail=str(e))
@@ -4,55 +4,56 @@ Credential Definitions API Routes - Acme
 """
 
 import logging
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, Depends, HTTPException
 
 from aries_cloudcontroller import AcaPyClient
 
+from routes import get_client
+from routes.cache import list_cache
+
 logger = logging.getLogger(__name__)
 router = APIRouter()
 
 
-def get_client() -> AcaPyClient:
-    """取得 ACA-Py 客戶端"""
-    from main import get_acapy_client
-    return get_acapy_client()
-
-
 @router.get("/credential-definitions")
-async def get_credential_definitions():
+async def get_credential_definitions(client: AcaPyClient = Depends(get_client)):
     """
     取得所有已創建的 Credential Definition ID 列表
     """
+    cached = list_cache.get("credential_definitions")
+    if cached is not None:
+        return cached
+    
     try:
-        client = get_client()
         result = await client.credential_definition.get_created_cred_defs()
         
-        return {
+        data = {
             "credential_definition_ids": result.credential_definition_ids if result.credential_definition_ids else []
         }
+        list_cache["credential_definitions"] = data
+        return data
     except Exception as e:
-        logger.error(f"Failed to get credential definitions: {e}")
+        logger.error("Failed to get credential definitions: %s", e)
         return {"credential_definition_ids": []}
 
 
 @router.get("/credential-definitions/{cred_def_id:path}")
-async def get_credential_definition(cred_def_id: str):
+async def get_credential_definition(cred_def_id: str, client: AcaPyClient = Depends(get_client)):
     """
     取得指定 Credential Definition 的詳細資訊
     """
     try:
-        client = get_client()
-        logger.info(f"Fetching credential definition: {cred_def_id}")
+        logger.info("Fetching credential definition: %s", cred_def_id)
         result = await client.credential_definition.get_cred_def(cred_def_id=cred_def_id)
         
         cred_def_dict = result.credential_definition.to_dict() if result.credential_definition else {}
-        logger.info(f"Credential definition keys: {cred_def_dict.keys()}")
+        logger.debug("Credential definition keys: %s", cred_def_dict.keys())
         
         return {
             "credential_definition": cred_def_dict
         }
     except Exception as e:
-        logger.error(f"Failed to get credential definition {cred_def_id}: {e}", exc_info=True)
+        logger.error("Failed to get credential definition %s: %s", cred_def_id, e, exc_info=True)
         raise HTTPException(
             status_code=404,
             detail=f"Credential definition not found: {cred_def_id}. Error: {str(e)}"
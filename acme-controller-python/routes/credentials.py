@@ -4,50 +4,60 @@ Acme 可以查看儲存的憑證（用於驗證時）
 """
 
 import logging
-from fastapi import APIRouter, HTTPException
+from typing import List
+from fastapi import APIRouter, Depends
+from pydantic import TypeAdapter
 
 from aries_cloudcontroller import AcaPyClient
+from aries_cloudcontroller.models import IndyCredInfo, V20CredExRecordDetail
+
+from routes import get_client
+from routes.cache import list_cache
+from routes.serializers import dump_results, json_response
 
 logger = logging.getLogger(__name__)
 router = APIRouter()
 
-
-def get_client() -> AcaPyClient:
-    """取得 ACA-Py 客戶端"""
-    from main import get_acapy_client
-    return get_acapy_client()
+_CRED_RECORDS = TypeAdapter(List[IndyCredInfo])
+_CRED_EX_RECORDS = TypeAdapter(List[V20CredExRecordDetail])
 
 
 @router.get("/credentials")
-async def get_credentials():
+async def get_credentials(client: AcaPyClient = Depends(get_client)):
     """
     取得已儲存的憑證列表
     Acme 可能會收到並儲存一些憑證
     """
+    cached = list_cache.get("credentials")
+    if cached is not None:
+        return json_response(cached)
+    
     try:
-        client = get_client()
         result = await client.credentials.get_credentials()
         
-        return {
-            "results": [cred.to_dict() for cred in result.results] if result.results else []
-        }
+        body = dump_results(_CRED_RECORDS, result.results)
+        list_cache["credentials"] = body
+        return json_response(body)
     except Exception as e:
-        logger.error(f"Failed to get credentials: {e}")
+        logger.error("Failed to get credentials: %s", e)
         return {"results": []}
 
 
 @router.get("/credential-exchanges")
-async def get_credential_exchanges():
+async def get_credential_exchanges(client: AcaPyClient = Depends(get_client)):
     """
     取得憑證交換記錄
     """
+    cached = list_cache.get("credential_exchanges")
+    if cached is not None:
+        return json_response(cached)
+    
     try:
-        client = get_client()
         result = await client.issue_credential_v2_0.get_records()
         
-        return {
-            "results": [record.to_dict() for record in result.results] if result.results else []
-        }
+        body = dump_results(_CRED_EX_RECORDS, result.results)
+        list_cache["credential_exchanges"] = body
+        return json_response(body)
     except Exception as e:
-        logger.error(f"Failed to get credential exchanges: {e}")
+        logger.error("Failed to get credential exchanges: %s", e)
         return {"results": []}
@@ -3,10 +3,11 @@ Acme Proofs API - Proof 請求與驗證
 Acme 作為 Verifier，向 Alice 請求並驗證 Proof
 """
 
+import asyncio
 import logging
 from typing import List, Optional, Dict, Any
-from fastapi import APIRouter, HTTPException
-from pydantic import BaseModel, Field
+from fastapi import APIRouter, Depends, HTTPException
+from pydantic import BaseModel, Field, TypeAdapter
 
 from aries_cloudcontroller import AcaPyClient
 from aries_cloudcontroller.models import (
@@ -14,16 +15,18 @@ from aries_cloudcontroller.models import (
     V20PresSendRequestRequest,
     IndyProofRequest,
     IndyProofReqAttrSpec,
+    IndyProofReqPredSpec,
+    V20PresExRecord,
 )
 
+from routes import get_client, get_ledger_semaphore
+from routes.cache import invalidate, list_cache
+from routes.serializers import dump_model, dump_results, json_response
+
 logger = logging.getLogger(__name__)
 router = APIRouter()
 
-
-def get_client() -> AcaPyClient:
-    """取得 ACA-Py 客戶端"""
-    from main import get_acapy_client
-    return get_acapy_client()
+_PRES_EX_RECORDS = TypeAdapter(List[V20PresExRecord])
 
 
 class ProofRequestAttribute(BaseModel):
@@ -57,25 +60,32 @@ class SendProofRequestModel(BaseModel):
 
 
 @router.get("/proofs")
-async def get_proofs():
+async def get_proofs(client: AcaPyClient = Depends(get_client)):
     """
     取得所有 Proof 記錄
     顯示 Acme 發送給 Alice 的 proof 請求和驗證結果
     """
+    cached = list_cache.get("proofs")
+    if cached is not None:
+        return json_response(cached)
+    
     try:
-        client = get_client()
         result = await client.present_proof_v2_0.get_records()
         
-        return {
-            "results": [record.to_dict() for record in result.results] if result.results else []
-        }
+        body = dump_results(_PRES_EX_RECORDS, result.results)
+        list_cache["proofs"] = body
+        return json_response(body)
     except Exception as e:
-        logger.error(f"Failed to get proofs: {e}")
+        logger.error("Failed to get proofs: %s", e)
         return {"results": []}
 
 
 @router.post("/proofs/send-request")
-async def send_proof_request(request: SendProofRequestPayload):
+async def send_proof_request(
+    request: SendProofRequestPayload,
+    client: AcaPyClient = Depends(get_client),
+    ledger_sem: asyncio.Semaphore = Depends(get_ledger_semaphore),
+):
     """
     向 Alice 發送 Proof Request（接受前端格式）
     Acme 請求 Alice 提供教育憑證的證明
@@ -85,32 +95,31 @@ async def send_proof_request(request: SendProofRequestPayload):
     - 範圍證明 (requested_predicates) - Zero-Knowledge Proofs
     """
     try:
-        client = get_client()
-        
-        logger.info(f"Sending proof request to connection: {request.connection_id}")
-        logger.info(f"Presentation request structure: {request.presentation_request}")
+        logger.info("Sending proof request to connection: %s", request.connection_id)
+        logger.debug("Presentation request structure: %s", request.presentation_request)
         
         # 從前端的 presentation_request 中提取 indy 結構
         indy_request_data = request.presentation_request.get("indy", {})
         
         # 構建 requested_attributes 字典
-        requested_attributes = {}
-        for attr_key, attr_value in indy_request_data.get("requested_attributes", {}).items():
-            requested_attributes[attr_key] = IndyProofReqAttrSpec(
+        requested_attributes = {
+            attr_key: IndyProofReqAttrSpec(
                 name=attr_value["name"],
                 restrictions=attr_value.get("restrictions")
             )
+            for attr_key, attr_value in indy_request_data.get("requested_attributes", {}).items()
+        }
         
         # 構建 requested_predicates 字典
-        requested_predicates = {}
-        for pred_key, pred_value in indy_request_data.get("requested_predicates", {}).items():
-            from aries_cloudcontroller.models import IndyProofReqPredSpec
-            requested_predicates[pred_key] = IndyProofReqPredSpec(
+        requested_predicates = {
+            pred_key: IndyProofReqPredSpec(
                 name=pred_value["name"],
                 p_type=pred_value["p_type"],
                 p_value=pred_value["p_value"],
                 restrictions=pred_value.get("restrictions")
             )
+            for pred_key, pred_value in indy_request_data.get("requested_predicates", {}).items()
+        }
         
         # 構建 IndyProofRequest
         indy_proof_request = IndyProofRequest(
@@ -129,49 +138,54 @@ async def send_proof_request(request: SendProofRequestPayload):
             comment=request.comment or "Proof request from Acme"
         )
         
-        result = await client.present_proof_v2_0.send_request_free(body=body)
+        async with ledger_sem:
+            result = await client.present_proof_v2_0.send_request_free(body=body)
+        invalidate("proofs")
         
-        logger.info(f"✓ Proof request sent successfully: {result.pres_ex_id if hasattr(result, 'pres_ex_id') else 'N/A'}")
+        logger.info("✓ Proof request sent successfully: %s", result.pres_ex_id or "N/A")
         
-        return result.to_dict()
+        return json_response(dump_model(result))
         
     except Exception as e:
-        logger.error(f"Failed to send proof request: {e}", exc_info=True)
+        logger.error("Failed to send proof request: %s", e, exc_info=True)
         raise HTTPException(status_code=400, detail=str(e))
 
 
 @router.post("/proofs/{pres_ex_id}/verify")
-async def verify_proof(pres_ex_id: str):
+async def verify_proof(
+    pres_ex_id: str,
+    client: AcaPyClient = Depends(get_client),
+    ledger_sem: asyncio.Semaphore = Depends(get_ledger_semaphore),
+):
     """
     驗證 Proof
     當 Alice 提供 proof 後，Acme 驗證其真實性
     """
     try:
-        client = get_client()
-        
-        result = await client.present_proof_v2_0.verify_presentation(
-            pres_ex_id=pres_ex_id
-        )
+        # 驗證需向 Ledger 查詢 schema/cred def/revocation registry
+        async with ledger_sem:
+            result = await client.present_proof_v2_0.verify_presentation(
+                pres_ex_id=pres_ex_id
+            )
+        invalidate("proofs")
         
-        return result.to_dict()
+        return json_response(dump_model(result))
         
     except Exception as e:
-        logger.error(f"Failed to verify proof {pres_ex_id}: {e}")
+        logger.error("Failed to verify proof %s: %s", pres_ex_id, e)
         raise HTTPException(status_code=400, detail=str(e))
 
 
 @router.get("/proofs/{pres_ex_id}")
-async def get_proof_detail(pres_ex_id: str):
+async def get_proof_detail(pres_ex_id: str, client: AcaPyClient = Depends(get_client)):
     """取得特定 Proof 的詳細資訊"""
     try:
-        client = get_client()
-        
         result = await client.present_proof_v2_0.get_record(
             pres_ex_id=pres_ex_id
         )
         
-        return result.to_dict()
+        return json_response(dump_model(result))
         
     except Exception as e:
-        logger.error(f"Failed to get proof detail {pres_ex_id}: {e}")
+        logger.error("Failed to get proof detail %s: %s", pres_ex_id, e)
         raise HTTPException(status_code=404, detail=str(e))
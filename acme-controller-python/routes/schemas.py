@@ -4,50 +4,51 @@ Schemas API Routes - Acme
 """
 
 import logging
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, Depends, HTTPException
 
 from aries_cloudcontroller import AcaPyClient
 
+from routes import get_client
+from routes.cache import list_cache
+
 logger = logging.getLogger(__name__)
 router = APIRouter()
 
 
-def get_client() -> AcaPyClient:
-    """取得 ACA-Py 客戶端"""
-    from main import get_acapy_client
-    return get_acapy_client()
-
-
 @router.get("/schemas")
-async def get_schemas():
+async def get_schemas(client: AcaPyClient = Depends(get_client)):
     """
     取得所有已創建的 Schema ID 列表
     """
+    cached = list_cache.get("schemas")
+    if cached is not None:
+        return cached
+    
     try:
-        client = get_client()
         result = await client.schema.get_created_schemas()
         
-        return {
+        data = {
             "schema_ids": result.schema_ids if result.schema_ids else []
         }
+        list_cache["schemas"] = data
+        return data
     except Exception as e:
-        logger.error(f"Failed to get schemas: {e}")
+        logger.error("Failed to get schemas: %s", e)
         return {"schema_ids": []}
 
 
 @router.get("/schemas/{schema_id:path}")
-async def get_schema(schema_id: str):
+async def get_schema(schema_id: str, client: AcaPyClient = Depends(get_client)):
     """
     取得指定 Schema 的詳細資訊
     """
     try:
-        client = get_client()
-        logger.info(f"Fetching schema: {schema_id}")
+        logger.info("Fetching schema: %s", schema_id)
         result = await client.schema.get_schema(schema_id=schema_id)
         
         data = result.to_dict()
-        logger.info(f"Schema data keys: {data.keys()}")
+        logger.debug("Schema data keys: %s", data.keys())
         return data
     except Exception as e:
-        logger.error(f"Failed to get schema {schema_id}: {e}", exc_info=True)
+        logger.error("Failed to get schema %s: %s", schema_id, e, exc_info=True)
         raise HTTPException(status_code=404, detail=f"Schema not found: {schema_id}. Error: {str(e)}")
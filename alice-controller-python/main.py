@@ -10,14 +10,18 @@ API 端點與原 Angular 版本保持兼容
 """
 
 import os
+import sys
+import asyncio
+import gzip
+import hashlib
 import logging
+from email.utils import formatdate
 from contextlib import asynccontextmanager
-from typing import Optional
 
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, HTTPException, Request
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
-from fastapi.responses import FileResponse
+from fastapi.responses import Response
 
 from aries_cloudcontroller import AcaPyClient
 
@@ -30,39 +34,72 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
-acapy_client: Optional[AcaPyClient] = None
+# 背景探測 ACA-Py Agent 狀態的逾時與間隔 (秒)
+STATUS_PROBE_TIMEOUT_SEC = 5
+STATUS_PROBE_INTERVAL_SEC = 10
 
 
-def get_acapy_client() -> AcaPyClient:
-    """取得全域 ACA-Py 客戶端實例"""
-    if acapy_client is None:
-        raise RuntimeError("ACA-Py client not initialized")
-    return acapy_client
+async def _probe_status(app: FastAPI, acapy_client: AcaPyClient):
+    """定期檢查 ACA-Py Agent 狀態並記錄在 app.state.agent_ready，啟動與 /api/status 都不必等待 Agent"""
+    while True:
+        try:
+            status = await asyncio.wait_for(acapy_client.server.get_status(), timeout=STATUS_PROBE_TIMEOUT_SEC)
+            if not app.state.agent_ready:
+                logger.info("✓ Alice ACA-Py agent connected successfully")
+                logger.info("  Version: %s", status.version or "N/A")
+            app.state.agent_ready = True
+        except Exception as e:
+            if app.state.agent_ready is not False:
+                logger.warning("✗ Unable to connect to Alice ACA-Py agent: %s", str(e) or type(e).__name__)
+            app.state.agent_ready = False
+        await asyncio.sleep(STATUS_PROBE_INTERVAL_SEC)
 
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     """應用程式生命週期管理"""
-    global acapy_client
     settings = get_settings()
     
-    logger.info(f"Initializing Alice ACA-Py client: {settings.alice_agent_url}")
+    agent_url = settings.alice_agent_url
+    logger.info("Initializing Alice ACA-Py client: %s", agent_url)
     acapy_client = AcaPyClient(
-        base_url=settings.alice_agent_url,
+        base_url=agent_url,
         admin_insecure=settings.admin_insecure
     )
+    # 路由透過 Depends(get_client) 由 app.state 取得客戶端
+    app.state.acapy_client = acapy_client
+    # 高成本操作 (會觸及 Ledger) 共用的並行上限，避免突發請求壓垮 ACA-Py 而拖慢其他便宜的讀取
+    # (LEDGER_CONCURRENCY 為所有 worker 合計，每個 worker 只取自己的份額)
+    app.state.ledger_sem = asyncio.Semaphore(settings.ledger_concurrency_per_worker)
     
+    # Agent 狀態在背景探測，啟動 (與 /health) 不受 Agent 回應速度影響
+    app.state.agent_ready = None
+    probe_task = asyncio.create_task(_probe_status(app, acapy_client))
+    
+    # index.html 很小且執行期間不會變動，啟動時讀入記憶體並預先 gzip，SPA fallback 不必每次讀檔
     try:
-        status = await acapy_client.server.get_status()
-        logger.info(f"✓ Alice ACA-Py agent connected successfully")
-        logger.info(f"  Version: {status.version if hasattr(status, 'version') else 'N/A'}")
-    except Exception as e:
-        logger.warning(f"✗ Unable to connect to Alice ACA-Py agent: {e}")
+        with open(INDEX_PATH, "rb") as f:
+            app.state.index_bytes = f.read()
+        app.state.index_gz = gzip.compress(app.state.index_bytes, 6)
+        # 條件式 GET 用的驗證值；gzip 與原始內容共用同一個弱 ETag
+        app.state.index_headers = {
+            "Cache-Control": "no-cache",
+            "Vary": "Accept-Encoding",
+            "ETag": 'W/"%s"' % hashlib.blake2b(app.state.index_bytes, digest_size=16).hexdigest(),
+            "Last-Modified": formatdate(os.path.getmtime(INDEX_PATH), usegmt=True),
+        }
+    except OSError:
+        app.state.index_bytes = None
+        app.state.index_gz = None
+        app.state.index_headers = None
     
     yield
     
     logger.info("Shutting down Alice ACA-Py client")
-    acapy_client = None
+    probe_task.cancel()
+    # 所有請求共用同一個 aiohttp 連線池，關閉時釋放連線
+    await acapy_client.close()
+    app.state.acapy_client = None
 
 
 app = FastAPI(
@@ -72,12 +109,13 @@ app = FastAPI(
     lifespan=lifespan
 )
 
+# 明確列出來源、方法與標頭：credentials 不能搭配 "*"，且列舉值只需做集合比對
 app.add_middleware(
     CORSMiddleware,
-    allow_origins=["*"],
+    allow_origins=[origin.strip() for origin in get_settings().cors_origins.split(",") if origin.strip()],
     allow_credentials=True,
-    allow_methods=["*"],
-    allow_headers=["*"],
+    allow_methods=["GET", "POST", "DELETE"],
+    allow_headers=["Content-Type", "Authorization"],
 )
 
 # 註冊路由
@@ -87,15 +125,9 @@ app.include_router(proofs.router, prefix="/api", tags=["proofs"])
 
 
 @app.get("/api/status")
-async def get_status():
-    """檢查 ACA-Py Agent 狀態"""
-    try:
-        client = get_acapy_client()
-        await client.server.get_status()
-        return {"status": "up"}
-    except Exception as e:
-        logger.error(f"Agent status check failed: {e}")
-        return {"status": "down"}
+async def get_status(request: Request):
+    """檢查 ACA-Py Agent 狀態 (回傳背景探測的最新結果)"""
+    return {"status": "up" if request.app.state.agent_ready else "down"}
 
 
 @app.get("/health")
@@ -104,34 +136,59 @@ async def health_check():
     return {"status": "healthy", "service": "alice-controller"}
 
 
+class ImmutableStaticFiles(StaticFiles):
+    """Vite build 的 assets 檔名含 content hash，內容不會變動，可讓瀏覽器永久快取"""
+
+    def file_response(self, *args, **kwargs) -> Response:
+        response = super().file_response(*args, **kwargs)
+        response.headers["Cache-Control"] = "public, max-age=31536000, immutable"
+        return response
+
+
 # 提供 React 前端靜態檔案
 # 注意: 在開發環境中，React 前端由 Vite dev server 提供
 # 在生產環境中，React build 後的檔案會被複製到 client/dist
 static_files_path = os.path.join(os.path.dirname(__file__), "client", "dist")
+# 前端 build 於執行期間不會變動，路徑計算一次即可 (內容於 lifespan 載入記憶體)
+INDEX_PATH = os.path.join(static_files_path, "index.html")
 if os.path.exists(static_files_path):
-    logger.info(f"Serving React frontend from: {static_files_path}")
+    logger.info("Serving React frontend from: %s", static_files_path)
     # 只有在 assets 目錄存在時才掛載
     assets_path = os.path.join(static_files_path, "assets")
     if os.path.exists(assets_path):
-        app.mount("/assets", StaticFiles(directory=assets_path), name="assets")
-        logger.info(f"Mounted assets directory: {assets_path}")
+        app.mount("/assets", ImmutableStaticFiles(directory=assets_path), name="assets")
+        logger.info("Mounted assets directory: %s", assets_path)
     else:
-        logger.warning(f"Assets directory not found at: {assets_path}, skipping mount")
+        logger.warning("Assets directory not found at: %s, skipping mount", assets_path)
+    
+    # 路由依註冊順序比對：未知的 /api 路徑先在這裡回 404，SPA fallback 不必再逐一檢查前綴
+    @app.get("/api/{full_path:path}", include_in_schema=False)
+    async def api_not_found(full_path: str):
+        raise HTTPException(status_code=404, detail="API endpoint not found")
     
     @app.get("/{full_path:path}")
-    async def serve_react_app(full_path: str):
+    async def serve_react_app(full_path: str, request: Request):
         """提供 React 應用程式 (SPA fallback)"""
         # API 路由已經被上面的 router 處理，這裡只處理前端路由
-        if full_path.startswith("api/"):
-            raise HTTPException(status_code=404, detail="API endpoint not found")
+        if app.state.index_bytes is None:
+            raise HTTPException(status_code=404, detail="Frontend not built yet")
         
-        index_path = os.path.join(static_files_path, "index.html")
-        if os.path.exists(index_path):
-            return FileResponse(index_path)
+        # index.html 引用帶 hash 的 assets，必須每次重新驗證；未變動時回 304 不傳 body
+        headers = dict(app.state.index_headers)
+        if_none_match = request.headers.get("if-none-match")
+        if if_none_match is not None:
+            not_modified = headers["ETag"] in (tag.strip() for tag in if_none_match.split(","))
         else:
-            raise HTTPException(status_code=404, detail="Frontend not built yet")
+            not_modified = request.headers.get("if-modified-since") == headers["Last-Modified"]
+        if not_modified:
+            return Response(status_code=304, headers=headers)
+        
+        if "gzip" in request.headers.get("accept-encoding", ""):
+            headers["Content-Encoding"] = "gzip"
+            return Response(content=app.state.index_gz, media_type="text/html", headers=headers)
+        return Response(content=app.state.index_bytes, media_type="text/html", headers=headers)
 else:
-    logger.warning(f"React frontend not found at: {static_files_path}")
+    logger.warning("React frontend not found at: %s", static_files_path)
     logger.warning("Run 'npm run build' in client/ directory to build frontend")
 
 
@@ -143,5 +200,10 @@ if __name__ == "__main__":
         host="0.0.0.0",
         port=settings.port,
         reload=settings.reload,
+        # 每個 worker 各自擁有 event loop 與 ACA-Py 連線池；reload 與多 worker 不能同時使用
+        workers=1 if settings.reload else settings.workers,
+        # uvicorn[standard] 已安裝 uvloop 與 httptools (uvloop 不支援 Windows)
+        loop="asyncio" if sys.platform == "win32" else "uvloop",
+        http="httptools",
         log_level="info"
     )
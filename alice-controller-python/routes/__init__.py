@@ -1 +1,17 @@
 """Alice Controller API Routes"""
+
+import asyncio
+
+from fastapi import Request
+
+from aries_cloudcontroller import AcaPyClient
+
+
+async def get_client(request: Request) -> AcaPyClient:
+    """取得 ACA-Py 客戶端 (FastAPI 依賴注入，實例由 lifespan 放在 app.state)"""
+    return request.app.state.acapy_client
+
+
+async def get_ledger_semaphore(request: Request) -> asyncio.Semaphore:
+    """取得限制高成本 ACA-Py/Ledger 操作並行數的 semaphore (由 lifespan 建立)"""
+    return request.app.state.ledger_sem
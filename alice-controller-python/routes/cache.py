@@ -0,0 +1,17 @@
+"""
+列表端點短期快取
+前端會頻繁輪詢列表端點，短時間內的重複請求直接回傳上次結果，不必每次都呼叫 ACA-Py
+"""
+
+from cachetools import TTLCache
+
+# 列表快取存活時間 (秒)，寫入類端點會主動清除對應快取
+LIST_CACHE_TTL_SEC = 1.0
+
+list_cache: TTLCache = TTLCache(maxsize=16, ttl=LIST_CACHE_TTL_SEC)
+
+
+def invalidate(*keys: str):
+    """清除指定的列表快取"""
+    for key in keys:
+        list_cache.pop(key, None)
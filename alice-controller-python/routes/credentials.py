@@ -3,92 +3,111 @@ Alice Credentials API - 憑證管理
 Alice 作為 Holder，接收並儲存來自 Faber 的憑證
 """
 
+import asyncio
 import logging
-from fastapi import APIRouter, HTTPException
+from typing import List
+from fastapi import APIRouter, Depends, HTTPException
+from pydantic import TypeAdapter
 
 from aries_cloudcontroller import AcaPyClient
+from aries_cloudcontroller.models import IndyCredInfo, V20CredExRecordDetail
+
+from routes import get_client, get_ledger_semaphore
+from routes.cache import invalidate, list_cache
+from routes.serializers import dump_model, dump_results, json_response
 
 logger = logging.getLogger(__name__)
 router = APIRouter()
 
-
-def get_client() -> AcaPyClient:
-    """取得 ACA-Py 客戶端"""
-    from main import get_acapy_client
-    return get_acapy_client()
+_CRED_RECORDS = TypeAdapter(List[IndyCredInfo])
+_CRED_EX_RECORDS = TypeAdapter(List[V20CredExRecordDetail])
 
 
 @router.get("/credentials")
-async def get_credentials():
+async def get_credentials(client: AcaPyClient = Depends(get_client)):
     """
     取得已儲存的憑證列表
     Alice 接收並儲存來自 Faber 的憑證後，可以在這裡查看
     """
+    cached = list_cache.get("credentials")
+    if cached is not None:
+        return json_response(cached)
+    
     try:
-        client = get_client()
         result = await client.credentials.get_credentials()
         
-        return {
-            "results": [cred.to_dict() for cred in result.results] if result.results else []
-        }
+        body = dump_results(_CRED_RECORDS, result.results)
+        list_cache["credentials"] = body
+        return json_response(body)
     except Exception as e:
-        logger.error(f"Failed to get credentials: {e}")
+        logger.error("Failed to get credentials: %s", e)
         return {"results": []}
 
 
 @router.get("/credential-exchanges")
-async def get_credential_exchanges():
+async def get_credential_exchanges(client: AcaPyClient = Depends(get_client)):
     """
     取得憑證交換記錄
     顯示 Alice 與 Faber 之間的憑證交換狀態
     """
+    cached = list_cache.get("credential_exchanges")
+    if cached is not None:
+        return json_response(cached)
+    
     try:
-        client = get_client()
         result = await client.issue_credential_v2_0.get_records()
         
-        return {
-            "results": [record.to_dict() for record in result.results] if result.results else []
-        }
+        body = dump_results(_CRED_EX_RECORDS, result.results)
+        list_cache["credential_exchanges"] = body
+        return json_response(body)
     except Exception as e:
-        logger.error(f"Failed to get credential exchanges: {e}")
+        logger.error("Failed to get credential exchanges: %s", e)
         return {"results": []}
 
 
 @router.post("/credential-exchanges/{cred_ex_id}/request")
-async def send_credential_request(cred_ex_id: str):
+async def send_credential_request(
+    cred_ex_id: str,
+    client: AcaPyClient = Depends(get_client),
+    ledger_sem: asyncio.Semaphore = Depends(get_ledger_semaphore),
+):
     """
     發送憑證請求
     當 Alice 收到 Faber 的 credential offer 時，發送 request 接受憑證
     """
     try:
-        client = get_client()
+        async with ledger_sem:
+            result = await client.issue_credential_v2_0.send_request(
+                cred_ex_id=cred_ex_id
+            )
+        invalidate("credential_exchanges")
         
-        result = await client.issue_credential_v2_0.send_request(
-            cred_ex_id=cred_ex_id
-        )
-        
-        return result.to_dict()
+        return json_response(dump_model(result))
         
     except Exception as e:
-        logger.error(f"Failed to send credential request {cred_ex_id}: {e}")
+        logger.error("Failed to send credential request %s: %s", cred_ex_id, e)
         raise HTTPException(status_code=400, detail=str(e))
 
 
 @router.post("/credential-exchanges/{cred_ex_id}/store")
-async def store_credential(cred_ex_id: str):
+async def store_credential(
+    cred_ex_id: str,
+    client: AcaPyClient = Depends(get_client),
+    ledger_sem: asyncio.Semaphore = Depends(get_ledger_semaphore),
+):
     """
     儲存憑證
     當 Alice 收到 Faber 發送的憑證後，將其儲存到錢包中
     """
     try:
-        client = get_client()
-        
-        result = await client.issue_credential_v2_0.store_credential(
-            cred_ex_id=cred_ex_id
-        )
+        async with ledger_sem:
+            result = await client.issue_credential_v2_0.store_credential(
+                cred_ex_id=cred_ex_id
+            )
+        invalidate("credentials", "credential_exchanges")
         
-        return result.to_dict()
+        return json_response(dump_model(result))
         
     except Exception as e:
-        logger.error(f"Failed to store credential {cred_ex_id}: {e}")
+        logger.error("Failed to store credential %s: %s", cred_ex_id, e)
         raise HTTPException(status_code=400, detail=str(e))
@@ -3,21 +3,24 @@ Alice Proofs API - Proof 管理
 Alice 作為 Holder/Prover，向 Acme (Verifier) 提供 Proof
 """
 
+import asyncio
 import logging
-from typing import Optional
-from fastapi import APIRouter, HTTPException
-from pydantic import BaseModel
+from typing import List
+from fastapi import APIRouter, Depends, HTTPException
+from pydantic import BaseModel, TypeAdapter
 
 from aries_cloudcontroller import AcaPyClient
+from aries_cloudcontroller.models import IndyCredPrecis, V20PresExRecord
+
+from routes import get_client, get_ledger_semaphore
+from routes.cache import invalidate, list_cache
+from routes.serializers import dump_model, dump_results, json_response
 
 logger = logging.getLogger(__name__)
 router = APIRouter()
 
-
-def get_client() -> AcaPyClient:
-    """取得 ACA-Py 客戶端"""
-    from main import get_acapy_client
-    return get_acapy_client()
+_PRES_EX_RECORDS = TypeAdapter(List[V20PresExRecord])
+_CRED_PRECIS = TypeAdapter(List[IndyCredPrecis])
 
 
 class SendProofRequest(BaseModel):
@@ -26,25 +29,32 @@ class SendProofRequest(BaseModel):
 
 
 @router.get("/proofs")
-async def get_proofs():
+async def get_proofs(client: AcaPyClient = Depends(get_client)):
     """
     取得所有 Proof 請求和記錄
     顯示 Alice 收到的來自 Acme 的 proof 請求
     """
+    cached = list_cache.get("proofs")
+    if cached is not None:
+        return json_response(cached)
+    
     try:
-        client = get_client()
         result = await client.present_proof_v2_0.get_records()
         
-        return {
-            "results": [record.to_dict() for record in result.results] if result.results else []
-        }
+        body = dump_results(_PRES_EX_RECORDS, result.results)
+        list_cache["proofs"] = body
+        return json_response(body)
     except Exception as e:
-        logger.error(f"Failed to get proofs: {e}")
+        logger.error("Failed to get proofs: %s", e)
         return {"results": []}
 
 
 @router.post("/proofs/{pres_ex_id}/send")
-async def send_proof(pres_ex_id: str):
+async def send_proof(
+    pres_ex_id: str,
+    client: AcaPyClient = Depends(get_client),
+    ledger_sem: asyncio.Semaphore = Depends(get_ledger_semaphore),
+):
     """
     發送 Proof
     當 Alice 收到 Acme 的 proof request 時，構建並發送 proof
@@ -52,35 +62,34 @@ async def send_proof(pres_ex_id: str):
     注意: 這個端點會自動選擇匹配的憑證並構建 proof
     """
     try:
-        client = get_client()
-        
         # 發送 proof presentation
-        result = await client.present_proof_v2_0.send_presentation(
-            pres_ex_id=pres_ex_id
-        )
+        async with ledger_sem:
+            result = await client.present_proof_v2_0.send_presentation(
+                pres_ex_id=pres_ex_id
+            )
+        invalidate("proofs")
         
-        return result.to_dict()
+        return json_response(dump_model(result))
         
     except Exception as e:
-        logger.error(f"Failed to send proof {pres_ex_id}: {e}")
+        logger.error("Failed to send proof %s: %s", pres_ex_id, e)
         raise HTTPException(status_code=400, detail=str(e))
 
 
 @router.get("/proofs/{pres_ex_id}/credentials")
-async def get_credentials_for_proof(pres_ex_id: str):
+async def get_credentials_for_proof(pres_ex_id: str, client: AcaPyClient = Depends(get_client)):
     """
     取得可用於此 Proof Request 的憑證列表
     Alice 可以查看哪些憑證可以用來回應 Acme 的 proof request
     """
     try:
-        client = get_client()
-        
         result = await client.present_proof_v2_0.get_matching_credentials(
             pres_ex_id=pres_ex_id
         )
         
-        return result.to_dict()
+        # ACA-Py 回傳的是 IndyCredPrecis 列表，直接由 pydantic-core 序列化
+        return json_response(_CRED_PRECIS.dump_json(result, by_alias=True, exclude_none=True))
         
     except Exception as e:
-        logger.error(f"Failed to get credentials for proof {pres_ex_id}: {e}")
+        logger.error("Failed to get credentials for proof %s: %s", pres_ex_id, e)
         raise HTTPException(status_code=400, detail=str(e))
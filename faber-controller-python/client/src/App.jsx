@@ -27,7 +27,8 @@ import { useApi } from './hooks/useApi.js'
  * - Connections: POST /api/connections/invitation → /out-of-band/create-invitation
  *                POST /api/connections/accept → /out-of-band/receive-invitation
  *                DELETE /api/connections/:id → /connections/{id}
- * - Credentials: POST /api/credentials/send → /issue-credential-2.0/send-offer
+ * - Credentials: POST /api/credentials/send → /issue-credential-2.0/send-offer (背景工作，回傳 job_id)
+ *                GET /api/credentials/jobs/:id → 輪詢發送結果
  * - Schemas:     GET /api/schemas → /schemas/created
  * - CredDefs:    GET /api/credential-definitions → /credential-definitions/created
  * UI 重點：只在元件掛載時載入，提供手動 Refresh，避免高頻輪詢。
@@ -1114,17 +1115,28 @@ function CredentialDefinitionsCard({ pushToast, setPendingCredentials }) {
 
       // 逾時避免永久卡在 Sending...（後端 600s 逾時，前端略長以優先收到 504）
       const SEND_TIMEOUT_MS = 610 * 1000
+      const SEND_POLL_INTERVAL_MS = 2000
       const controller = new AbortController()
       const timeoutId = setTimeout(() => controller.abort(), SEND_TIMEOUT_MS)
 
-      api.request('/api/credentials/send', {
-        method: 'POST',
-        headers: {
-          'Content-Type': 'application/json',
-        },
-        body: JSON.stringify(payload),
-        signal: controller.signal,
-      }).then((result) => {
+      // 後端立即回傳 job_id，實際送出在背景進行；輪詢工作狀態直到完成或失敗
+      const sendAndWait = async () => {
+        const job = await api.request('/api/credentials/send', {
+          method: 'POST',
+          headers: {
+            'Content-Type': 'application/json',
+          },
+          body: JSON.stringify(payload),
+          signal: controller.signal,
+        })
+        for (;;) {
+          await new Promise((resolve) => setTimeout(resolve, SEND_POLL_INTERVAL_MS))
+          const status = await api.request(`/api/credentials/jobs/${job.job_id}`, { signal: controller.signal })
+          if (status?.status === 'completed') return status.result
+        }
+      }
+
+      sendAndWait().then((result) => {
         clearTimeout(timeoutId)
         const durationSec = Math.round((Date.now() - startTime) / 1000)
         
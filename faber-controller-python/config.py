@@ -21,10 +21,22 @@ class Settings(BaseSettings):
     # Controller 服務設定
     port: int = 3000
     reload: bool = os.getenv("RELOAD", "false").lower() == "true"
+    # worker 行程數 (reload 模式下固定為 1)
+    # 須維持 1：發送憑證的背景工作 (GET /api/credentials/jobs/{job_id}) 只存在建立它的行程中，
+    # 多 worker 時輪詢會落到其他行程而找不到工作
+    workers: int = int(os.getenv("WEB_CONCURRENCY", "1"))
+    # 等待 accept 的連線佇列長度，與 keep-alive 閒置連線保留秒數
+    backlog: int = int(os.getenv("BACKLOG", "4096"))
+    timeout_keep_alive: int = int(os.getenv("TIMEOUT_KEEP_ALIVE", "30"))
+    # 同時進行中的高成本 ACA-Py/Ledger 寫入操作上限 (發送憑證、撤銷)
+    ledger_concurrency: int = int(os.getenv("LEDGER_CONCURRENCY", "16"))
     
     # 運行模式
     runmode: str = os.getenv("RUNMODE", "docker")
     
+    # Schema 快取的 SQLite 檔案路徑 (重啟後不必重新查詢 Ledger)；設為空字串則只快取在記憶體
+    schema_cache_db: str = os.getenv("SCHEMA_CACHE_DB", "schema_cache.db")
+    
     @property
     def faber_agent_url(self) -> str:
         """構建 Faber Agent 的完整 URL"""
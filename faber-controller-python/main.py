@@ -14,16 +14,19 @@ Faber Controller - Python Backend
 """
 
 import os
+import asyncio
+import sys
 import logging
 from contextlib import asynccontextmanager
 from typing import Optional
 
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, HTTPException, Response
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
-from fastapi.responses import FileResponse
+from fastapi.responses import ORJSONResponse
 
 from aries_cloudcontroller import AcaPyClient
+from aries_cloudcontroller.rest import RESTClientObject
 
 from routes import connections, schemas, credential_definitions, credentials
 from config import get_settings
@@ -38,6 +41,9 @@ logger = logging.getLogger(__name__)
 # 全域 ACA-Py 客戶端
 acapy_client: Optional[AcaPyClient] = None
 
+# 連往 ACA-Py 的連線池上限 (aries-cloudcontroller 預設為 100)
+ACAPY_POOL_LIMIT = 512
+
 
 def get_acapy_client() -> AcaPyClient:
     """取得全域 ACA-Py 客戶端實例"""
@@ -46,6 +52,20 @@ def get_acapy_client() -> AcaPyClient:
     return acapy_client
 
 
+async def tune_connection_pool(client: AcaPyClient):
+    """
+    以較大的連線池重建 AcaPyClient 的 REST client
+    AcaPyClient 在建構時才建立 Configuration，無法事先傳入連線池參數，
+    因此調整 connection_pool_maxsize 後依同一份設定重建，
+    SSL 設定 (verify_ssl/cert_file) 與 retry client 會與 session 一併重新建立
+    """
+    api_client = client.api_client
+    default_rest_client = api_client.rest_client
+    client.configuration.connection_pool_maxsize = ACAPY_POOL_LIMIT
+    api_client.rest_client = RESTClientObject(client.configuration)
+    await default_rest_client.close()
+
+
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     """應用程式生命週期管理"""
@@ -53,26 +73,38 @@ async def lifespan(app: FastAPI):
     settings = get_settings()
     
     # 啟動時初始化 ACA-Py 客戶端
-    logger.info(f"Initializing ACA-Py client: {settings.faber_agent_url}")
+    logger.info("Initializing ACA-Py client: %s", settings.faber_agent_url)
     acapy_client = AcaPyClient(
         base_url=settings.faber_agent_url,
         admin_insecure=settings.admin_insecure
     )
+    await tune_connection_pool(acapy_client)
+    # 啟動時將客戶端注入各路由模組，處理請求時直接讀取模組變數
+    for module in (connections, schemas, credentials, credential_definitions):
+        module.set_client(acapy_client)
+    # 高成本寫入 (會觸及 Ledger) 共用的並行上限，避免突發請求壓垮 ACA-Py 而拖慢其他便宜的讀取
+    credentials.set_ledger_semaphore(asyncio.Semaphore(settings.ledger_concurrency))
     
     # 測試連線
     try:
         status = await acapy_client.server.get_status()
-        logger.info(f"✓ ACA-Py agent connected successfully")
-        logger.info(f"  Version: {status.version if hasattr(status, 'version') else 'N/A'}")
+        logger.info("✓ ACA-Py agent connected successfully")
+        logger.info("  Version: %s", status.version or 'N/A')
     except Exception as e:
-        logger.warning(f"✗ Unable to connect to ACA-Py agent: {e}")
-        logger.warning(f"  Agent may not be ready yet, will retry on first request")
+        logger.warning("✗ Unable to connect to ACA-Py agent: %s", e)
+        logger.warning("  Agent may not be ready yet, will retry on first request")
     
     yield
     
     # 關閉時清理資源
     logger.info("Shutting down ACA-Py client")
+    # 先結束仍在使用連線的背景工作，避免關閉 session 後工作失敗或在未完成狀態下被銷毀
+    await credentials.shutdown_jobs()
+    for module in (connections, schemas, credentials, credential_definitions):
+        module.set_client(None)
+    await acapy_client.close()
     acapy_client = None
+    await schemas.close_disk_cache()
 
 
 # 創建 FastAPI 應用程式
@@ -80,6 +112,8 @@ app = FastAPI(
     title="Faber Controller",
     description="Supply Chain Issuer Platform - Python Backend with aries-cloudcontroller",
     version="2.0.0",
+    # 以 orjson 編碼 JSON 回應，比標準庫 json 快
+    default_response_class=ORJSONResponse,
     lifespan=lifespan
 )
 
@@ -111,7 +145,7 @@ async def get_status():
         await client.server.get_status()
         return {"status": "up"}
     except Exception as e:
-        logger.error(f"Agent status check failed: {e}")
+        logger.error("Agent status check failed: %s", e)
         return {"status": "down"}
 
 
@@ -125,9 +159,21 @@ async def health_check():
 # 注意: 在開發環境中，React 前端由 Vite dev server 提供
 # 在生產環境中，React build 後的檔案會被複製到 client/dist
 static_files_path = os.path.join(os.path.dirname(__file__), "client", "dist")
+# 前端 build 於執行期間不會變動；index.html 很小，啟動時讀入記憶體，SPA fallback 不必每次 stat/讀檔
+INDEX_PATH = os.path.join(static_files_path, "index.html")
+try:
+    with open(INDEX_PATH, "rb") as f:
+        INDEX_BYTES = f.read()
+except OSError:
+    INDEX_BYTES = None
 if os.path.exists(static_files_path):
-    logger.info(f"Serving React frontend from: {static_files_path}")
-    app.mount("/assets", StaticFiles(directory=os.path.join(static_files_path, "assets")), name="assets")
+    logger.info("Serving React frontend from: %s", static_files_path)
+    # 只有在 assets 目錄存在時才掛載 (StaticFiles 預設 check_dir=True，目錄不存在會在啟動時失敗)
+    assets_path = os.path.join(static_files_path, "assets")
+    if os.path.isdir(assets_path):
+        app.mount("/assets", StaticFiles(directory=assets_path, follow_symlink=False), name="assets")
+    else:
+        logger.warning("Assets directory not found at: %s, skipping mount", assets_path)
     
     @app.get("/{full_path:path}")
     async def serve_react_app(full_path: str):
@@ -136,13 +182,11 @@ if os.path.exists(static_files_path):
         if full_path.startswith("api/"):
             raise HTTPException(status_code=404, detail="API endpoint not found")
         
-        index_path = os.path.join(static_files_path, "index.html")
-        if os.path.exists(index_path):
-            return FileResponse(index_path)
-        else:
-            raise HTTPException(status_code=404, detail="Frontend not built yet")
+        if INDEX_BYTES is not None:
+            return Response(content=INDEX_BYTES, media_type="text/html")
+        raise HTTPException(status_code=404, detail="Frontend not built yet")
 else:
-    logger.warning(f"React frontend not found at: {static_files_path}")
+    logger.warning("React frontend not found at: %s", static_files_path)
     logger.warning("Run 'npm run build' in client/ directory to build frontend")
 
 
@@ -154,5 +198,12 @@ if __name__ == "__main__":
         host="0.0.0.0",
         port=settings.port,
         reload=settings.reload,
+        # 每個 worker 各自擁有 event loop 與 ACA-Py 客戶端；reload 與多 worker 不能同時使用
+        workers=1 if settings.reload else settings.workers,
+        backlog=settings.backlog,
+        timeout_keep_alive=settings.timeout_keep_alive,
+        # uvicorn[standard] 已安裝 uvloop 與 httptools (uvloop 不支援 Windows)
+        loop="asyncio" if sys.platform == "win32" else "uvloop",
+        http="httptools",
         log_level="info"
     )
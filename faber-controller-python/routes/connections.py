@@ -15,19 +15,31 @@ Connections API Routes
 """
 
 import logging
+import re
+
+import orjson
 from typing import Any, Dict, List
-from fastapi import APIRouter, HTTPException
-from pydantic import BaseModel
+from fastapi import APIRouter, HTTPException, Request
+from pydantic import BaseModel, TypeAdapter, ValidationError
 
 from aries_cloudcontroller import AcaPyClient
 from aries_cloudcontroller.models import (
     InvitationCreateRequest,
     InvitationMessage,
+    ConnRecord,
 )
 
+from routes.serializers import dump_model, dump_results, json_response
+
 logger = logging.getLogger(__name__)
 router = APIRouter()
 
+_CONN_RECORDS = TypeAdapter(List[ConnRecord])
+# ConnRecord.to_dict() 會排除 readOnly 欄位 rfc23_state，序列化時保持一致
+_CONN_EXCLUDE = {"__all__": {"rfc23_state"}}
+# 缺少外層大括號的邀請字串 (以 "@type" 或 "@id" 開頭)
+_NEEDS_BRACES = re.compile(r'"@(?:type|id)"')
+
 # 全域客戶端將由 main.py 注入
 _client: AcaPyClient = None
 
@@ -39,13 +51,12 @@ def set_client(client: AcaPyClient):
 
 
 def get_client() -> AcaPyClient:
-    """取得 ACA-Py 客戶端"""
-    from main import get_acapy_client
-    return get_acapy_client()
+    """取得 ACA-Py 客戶端 (由 main.py lifespan 透過 set_client 注入)"""
+    return _client
 
 
 class InvitationAcceptRequest(BaseModel):
-    """接受邀請的請求模型"""
+    """接受邀請的請求模型 (僅供 OpenAPI 文件使用，實際請求由 accept_invitation 直接解析原始 bytes)"""
     invitation: str | Dict[str, Any]
 
 
@@ -64,12 +75,10 @@ async def get_connections():
         client = get_client()
         connections = await client.connection.get_connections()
         
-        # 轉換為與前端兼容的格式
-        return {
-            "results": [conn.to_dict() for conn in connections.results] if connections.results else []
-        }
+        # 轉換為與前端兼容的格式 ({"results": [...]})，由 pydantic-core 一次序列化
+        return json_response(dump_results(_CONN_RECORDS, connections.results, exclude=_CONN_EXCLUDE))
     except Exception as e:
-        logger.error(f"Failed to get connections: {e}")
+        logger.error("Failed to get connections: %s", e)
         return {"results": []}
 
 
@@ -101,17 +110,25 @@ async def create_invitation():
         
         # 返回與原 Node.js 版本兼容的格式
         # InvitationRecord 包含 invitation 欄位（InvitationMessage 類型）
-        if hasattr(result, 'invitation') and result.invitation:
-            return result.invitation.to_dict()
-        return result.to_dict()
+        if result.invitation:
+            return json_response(dump_model(result.invitation))
+        return json_response(dump_model(result))
         
     except Exception as e:
-        logger.error(f"Failed to create invitation: {e}")
+        logger.error("Failed to create invitation: %s", e)
         raise HTTPException(status_code=500, detail=str(e))
 
 
-@router.post("/connections/accept")
-async def accept_invitation(request: InvitationAcceptRequest):
+@router.post(
+    "/connections/accept",
+    openapi_extra={
+        "requestBody": {
+            "required": True,
+            "content": {"application/json": {"schema": InvitationAcceptRequest.model_json_schema()}},
+        }
+    },
+)
+async def accept_invitation(request: Request):
     """
     接受邀請
     
@@ -120,51 +137,47 @@ async def accept_invitation(request: InvitationAcceptRequest):
     差異:
     - 原版本: 手動解析 JSON 字串，手動構建請求
     - 新版本: Pydantic 自動驗證，型別安全
+
+    請求本體以原始 bytes 讀入，orjson 只解析一次外層 envelope，
+    不再經過 FastAPI 的 body 解析與 InvitationAcceptRequest 中間模型
     """
     try:
         client = get_client()
         
         # 處理邀請內容 (可能是字串或字典)
-        invitation_data = request.invitation
+        try:
+            envelope = orjson.loads(await request.body())
+        except orjson.JSONDecodeError as e:
+            raise HTTPException(status_code=422, detail=f"Invalid JSON body: {e}")
+        if not isinstance(envelope, dict) or not isinstance(envelope.get("invitation"), (str, dict)):
+            raise HTTPException(status_code=422, detail="Field 'invitation' must be a JSON string or object")
+        invitation_data = envelope["invitation"]
         
-        # 如果是字串，嘗試解析 JSON
-        if isinstance(invitation_data, str):
-            import json
-            import re
-            
-            # 清理字串：移除多餘的空白和換行
-            invitation_data = invitation_data.strip()
-            
-            # 如果字串不是以 { 開頭，嘗試修復（可能是缺少外層大括號）
-            if not invitation_data.startswith('{'):
-                # 嘗試添加外層大括號
-                if invitation_data.startswith('"@type"') or invitation_data.startswith('"@id"'):
-                    invitation_data = '{' + invitation_data + '}'
-                    logger.warning("Fixed invitation JSON by adding outer braces")
-            
-            try:
-                invitation_data = json.loads(invitation_data)
-            except json.JSONDecodeError as json_err:
-                logger.error(f"JSON parse error: {json_err}")
-                logger.error(f"Invitation string: {invitation_data[:200]}...")
+        # 轉換為 InvitationMessage：字串直接交給 pydantic (jiter) 一次完成解析與驗證，不經過中間 dict
+        try:
+            if isinstance(invitation_data, str):
+                # 正常的 JSON 字串以 { 開頭 (前後空白 JSON 解析器可容忍)，只有其他情況才清理並嘗試修復
+                if invitation_data[:1] != '{':
+                    invitation_data = invitation_data.strip()
+                    # 可能是缺少外層大括號
+                    if _NEEDS_BRACES.match(invitation_data):
+                        invitation_data = '{' + invitation_data + '}'
+                        logger.warning("Fixed invitation JSON by adding outer braces")
+                
+                invitation_msg = InvitationMessage.model_validate_json(invitation_data)
+            else:
+                invitation_msg = InvitationMessage.model_validate(invitation_data)
+        except ValidationError as model_err:
+            first_err = model_err.errors()[0]
+            if first_err["type"] == "json_invalid":
+                logger.error("JSON parse error: %s", first_err['msg'])
+                logger.error("Invitation string: %s...", invitation_data[:200])
                 raise HTTPException(
                     status_code=400,
-                    detail=f"Failed to parse invitation JSON: {str(json_err)}. Please ensure the JSON is valid."
+                    detail=f"Failed to parse invitation JSON: {first_err['msg']}. Please ensure the JSON is valid."
                 )
-        
-        # 驗證 invitation_data 是字典
-        if not isinstance(invitation_data, dict):
-            raise HTTPException(
-                status_code=400,
-                detail=f"Invalid invitation format: expected dict, got {type(invitation_data).__name__}"
-            )
-        
-        # 轉換為 InvitationMessage
-        try:
-            invitation_msg = InvitationMessage.from_dict(invitation_data)
-        except Exception as model_err:
-            logger.error(f"Failed to create InvitationMessage: {model_err}")
-            logger.error(f"Invitation data: {invitation_data}")
+            logger.error("Failed to create InvitationMessage: %s", model_err)
+            logger.error("Invitation data: %s", invitation_data)
             raise HTTPException(
                 status_code=400,
                 detail=f"Invalid invitation format: {str(model_err)}"
@@ -176,21 +189,14 @@ async def accept_invitation(request: InvitationAcceptRequest):
         )
         
         # OobRecord 包含 connection_id
-        connection_id = None
-        if hasattr(result, 'connection_id'):
-            connection_id = result.connection_id
-        elif hasattr(result, 'attachments') and result.attachments:
-            # 可能從 attachments 中提取 connection_id
-            pass
-        
-        logger.info(f"✓ Invitation accepted successfully, connection_id: {connection_id}")
-        return {"ok": True, "connection_id": connection_id}
+        logger.info("✓ Invitation accepted successfully, connection_id: %s", result.connection_id)
+        return {"ok": True, "connection_id": result.connection_id}
         
     except HTTPException:
         # 重新拋出 HTTPException
         raise
     except Exception as e:
-        logger.error(f"Failed to accept invitation: {e}", exc_info=True)
+        logger.error("Failed to accept invitation: %s", e, exc_info=True)
         raise HTTPException(status_code=400, detail=f"Failed to accept invitation: {str(e)}")
 
 
@@ -214,12 +220,12 @@ async def remove_connection(connection_id: str):
             await client.connection.delete_connection(conn_id=connection_id)
         except Exception as e:
             # 如果失敗，嘗試使用 remove 端點
-            logger.warning(f"DELETE failed, trying POST remove: {e}")
+            logger.warning("DELETE failed, trying POST remove: %s", e)
             # 這裡可能需要根據實際 ACA-Py 版本調整
             raise
         
         return {"status": "removed"}
         
     except Exception as e:
-        logger.error(f"Failed to remove connection {connection_id}: {e}")
+        logger.error("Failed to remove connection %s: %s", connection_id, e)
         raise HTTPException(status_code=500, detail=str(e))
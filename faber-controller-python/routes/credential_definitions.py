@@ -13,6 +13,7 @@ Credential Definitions API Routes
 """
 
 import logging
+from cachetools import TTLCache
 from fastapi import APIRouter, HTTPException
 
 from aries_cloudcontroller import AcaPyClient
@@ -20,11 +21,33 @@ from aries_cloudcontroller import AcaPyClient
 logger = logging.getLogger(__name__)
 router = APIRouter()
 
+# Credential Definition 寫入 Ledger 後內容不會變動，詳情可長時間快取
+CRED_DEF_CACHE_TTL_SEC = 3600
+# ID 列表會因新建 Credential Definition 而變動，只短暫快取 (新建時也會主動清除)
+CRED_DEF_LIST_CACHE_TTL_SEC = 30
+
+_cred_def_cache: TTLCache = TTLCache(maxsize=256, ttl=CRED_DEF_CACHE_TTL_SEC)
+_cred_def_ids_cache: TTLCache = TTLCache(maxsize=1, ttl=CRED_DEF_LIST_CACHE_TTL_SEC)
+
+
+# 全域客戶端將由 main.py 注入
+_client: AcaPyClient = None
+
+
+def set_client(client: AcaPyClient):
+    """設定 ACA-Py 客戶端"""
+    global _client
+    _client = client
+
 
 def get_client() -> AcaPyClient:
-    """取得 ACA-Py 客戶端"""
-    from main import get_acapy_client
-    return get_acapy_client()
+    """取得 ACA-Py 客戶端 (由 main.py lifespan 透過 set_client 注入)"""
+    return _client
+
+
+def invalidate_credential_definitions():
+    """清除 Credential Definition ID 列表快取 (新建 Credential Definition 後呼叫)"""
+    _cred_def_ids_cache.clear()
 
 
 @router.get("/credential-definitions")
@@ -38,15 +61,21 @@ async def get_credential_definitions():
     - 原版本: httpAsync({path: '/credential-definitions/created'})
     - 新版本: client.credential_definition.get_created_cred_defs()
     """
+    cached = _cred_def_ids_cache.get("ids")
+    if cached is not None:
+        return cached
+    
     try:
         client = get_client()
         result = await client.credential_definition.get_created_cred_defs()
         
-        return {
+        response = {
             "credential_definition_ids": result.credential_definition_ids if result.credential_definition_ids else []
         }
+        _cred_def_ids_cache["ids"] = response
+        return response
     except Exception as e:
-        logger.error(f"Failed to get credential definitions: {e}")
+        logger.error("Failed to get credential definitions: %s", e)
         return {"credential_definition_ids": []}
 
 
@@ -66,24 +95,33 @@ async def get_credential_definition(cred_def_id: str):
     - aries-cloudcontroller 會自動處理這些特殊字符
     - 確保返回 schema_id 欄位，供前端讀取 credential_definition.schema_id
     """
+    cached = _cred_def_cache.get(cred_def_id)
+    if cached is not None:
+        return cached
+    
     try:
         client = get_client()
-        logger.info(f"Fetching credential definition: {cred_def_id}")
+        logger.info("Fetching credential definition: %s", cred_def_id)
         result = await client.credential_definition.get_cred_def(cred_def_id=cred_def_id)
         
         # 使用 by_alias=True 確保返回 JSON 格式的欄位名稱
         cred_def_dict = result.credential_definition.to_dict() if result.credential_definition else {}
         
         # 調試日誌：檢查返回的資料結構
-        logger.info(f"Credential definition keys: {cred_def_dict.keys()}")
-        logger.info(f"Schema ID in cred_def: {cred_def_dict.get('schema_id') or cred_def_dict.get('schemaId', 'NOT FOUND')}")
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("Credential definition keys: %s", cred_def_dict.keys())
+            logger.debug("Schema ID in cred_def: %s", cred_def_dict.get('schema_id') or cred_def_dict.get('schemaId', 'NOT FOUND'))
         
         # 返回與前端兼容的格式
-        return {
+        response = {
             "credential_definition": cred_def_dict
         }
+        # 只快取 Ledger 上確實存在的 Credential Definition
+        if result.credential_definition:
+            _cred_def_cache[cred_def_id] = response
+        return response
     except Exception as e:
-        logger.error(f"Failed to get credential definition {cred_def_id}: {e}", exc_info=True)
+        logger.error("Failed to get credential definition %s: %s", cred_def_id, e, exc_info=True)
         raise HTTPException(
             status_code=404,
             detail=f"Credential definition not found: {cred_def_id}. Error: {str(e)}"
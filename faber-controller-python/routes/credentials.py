@@ -3,9 +3,11 @@ Credentials API Routes
 管理憑證發放和撤銷
 
 對應原 Node.js 版本的 API:
-- POST /api/credentials/send -> 發送憑證
+- POST /api/credentials/send -> 發送憑證 (背景工作，回傳 job_id)
+- GET /api/credentials/jobs/:id -> 查詢發送憑證工作狀態
 - GET /api/credential-exchanges -> 取得憑證交換記錄
 - POST /api/credentials/revoke -> 撤銷憑證
+- POST /api/credentials/revoke-batch -> 批次撤銷憑證
 
 使用 aries-cloudcontroller-python 的優勢:
 1. 完整的 V20CredExRecord 型別定義
@@ -15,12 +17,10 @@ Credentials API Routes
 
 import asyncio
 import logging
-from typing import List, Optional, Dict, Any
-from fastapi import APIRouter, HTTPException
-from pydantic import BaseModel, Field
-
-# 送出憑證時 ACA-Py 與 Ledger 可能較慢，設定逾時避免請求永久卡住、前端一直顯示 Sending...
-SEND_CREDENTIAL_TIMEOUT_SEC = 600
+import uuid
+from typing import List, Optional, Dict
+from fastapi import APIRouter, HTTPException, Response
+from pydantic import BaseModel, ConfigDict, Field, TypeAdapter
 
 from aries_cloudcontroller import AcaPyClient
 from aries_cloudcontroller.models import (
@@ -29,31 +29,60 @@ from aries_cloudcontroller.models import (
     V20CredFilterIndy,
     V20CredAttrSpec,
     V20CredPreview,
+    V20CredExRecordDetail,
+    PublishRevocations,
 )
 
+from routes.serializers import dump_results, json_response
+
 logger = logging.getLogger(__name__)
 router = APIRouter()
 
+# 送出憑證時 ACA-Py 與 Ledger 可能較慢，設定逾時避免背景工作永久卡住、前端一直顯示 Sending...
+# (自工作建立起算，包含等待 LEDGER_CONCURRENCY 名額的時間)
+SEND_CREDENTIAL_TIMEOUT_SEC = 600
+# 完成的工作結果保留秒數，供前端輪詢取得
+SEND_CREDENTIAL_JOB_TTL_SEC = 600
+
+_CRED_EX_RECORDS = TypeAdapter(List[V20CredExRecordDetail])
+
+# 發送憑證的背景工作 (job_id -> Task)；只存在單一行程記憶體中，
+# 多 worker (WEB_CONCURRENCY > 1) 時輪詢可能落到其他 worker 而回 404，因此 Faber 須以單一 worker 運行
+_jobs: Dict[str, asyncio.Task] = {}
+
+
+# 全域客戶端將由 main.py 注入
+_client: AcaPyClient = None
+
+
+def set_client(client: AcaPyClient):
+    """設定 ACA-Py 客戶端"""
+    global _client
+    _client = client
+
 
 def get_client() -> AcaPyClient:
-    """取得 ACA-Py 客戶端"""
-    from main import get_acapy_client
-    return get_acapy_client()
+    """取得 ACA-Py 客戶端 (由 main.py lifespan 透過 set_client 注入)"""
+    return _client
+
+
+# 限制同時進行的高成本 ACA-Py/Ledger 寫入 (發送憑證、撤銷)，由 main.py lifespan 注入
+_ledger_sem: asyncio.Semaphore = None
 
 
-class CredentialAttribute(BaseModel):
-    """憑證屬性"""
-    name: str
-    value: str
+def set_ledger_semaphore(sem: asyncio.Semaphore):
+    """設定高成本操作共用的 semaphore"""
+    global _ledger_sem
+    _ledger_sem = sem
 
 
 class CredentialProposal(BaseModel):
     """憑證提案"""
     type_: str = Field(alias="@type", default="https://didcomm.org/issue-credential/2.0/credential-preview")
-    attributes: List[CredentialAttribute]
-    
-    class Config:
-        populate_by_name = True
+    # 請求解析時直接驗證為 ACA-Py 的 V20CredAttrSpec，送出時不必逐筆轉換
+    attributes: List[V20CredAttrSpec]
+
+    model_config = ConfigDict(populate_by_name=True)
 
 
 class IndyFilter(BaseModel):
@@ -83,7 +112,43 @@ class RevokeCredentialRequest(BaseModel):
     publish: bool = Field(default=True, description="是否立即發布到 Ledger")
 
 
-@router.post("/credentials/send")
+class RevokeCredentialsBatchRequest(BaseModel):
+    """批次撤銷憑證的請求模型"""
+    cred_ex_ids: List[str] = Field(..., min_length=1, description="Credential Exchange ID 列表")
+    publish: bool = Field(default=True, description="全部撤銷後是否一次發布到 Ledger")
+
+
+async def _send_offer(client: AcaPyClient, body: V20CredOfferRequest):
+    """送出憑證 offer (排隊等待 semaphore 的時間也計入逾時，與前端的等待上限一致；逾時避免永久卡住)"""
+    async def send():
+        async with _ledger_sem:
+            return await client.issue_credential_v2_0.send_offer_free(body=body)
+    
+    return await asyncio.wait_for(send(), timeout=SEND_CREDENTIAL_TIMEOUT_SEC)
+
+
+def _finish_job(job_id: str, task: asyncio.Task):
+    """背景工作結束時記錄結果，並在保留期限後移除"""
+    if task.cancelled():
+        logger.warning("Send credential job %s was cancelled", job_id)
+    elif isinstance(task.exception(), asyncio.TimeoutError):
+        logger.error("Send credential timed out (ACA-Py/Ledger slow or unresponsive)")
+    elif task.exception() is not None:
+        logger.error("Failed to send credential: %s", task.exception())
+    else:
+        logger.info("✓ Credential sent successfully: %s", task.result().cred_ex_id or 'N/A')
+    asyncio.get_running_loop().call_later(SEND_CREDENTIAL_JOB_TTL_SEC, _jobs.pop, job_id, None)
+
+
+async def shutdown_jobs():
+    """取消所有進行中的發送憑證工作並等待結束 (由 main.py lifespan 在關閉 ACA-Py 客戶端前呼叫)"""
+    tasks = [task for task in _jobs.values() if not task.done()]
+    for task in tasks:
+        task.cancel()
+    await asyncio.gather(*tasks, return_exceptions=True)
+
+
+@router.post("/credentials/send", status_code=202)
 async def send_credential(request: SendCredentialRequest):
     """
     發送憑證給指定連線
@@ -98,30 +163,28 @@ async def send_credential(request: SendCredentialRequest):
     1. 自動驗證 connection_id, cred_def_id 必填
     2. 自動驗證 attributes 格式
     3. 型別安全的 API 調用
+    
+    回傳 202 與 job_id，實際送出在背景進行，
+    以 GET /api/credentials/jobs/{job_id} 查詢結果
     """
     try:
         client = get_client()
         
         # 轉換為 aries-cloudcontroller 的模型
-        logger.info(f"Sending credential to connection: {request.connection_id}")
-        logger.info(f"Credential Definition: {request.cred_def_id}")
+        logger.info("Sending credential to connection: %s", request.connection_id)
+        logger.debug("Credential Definition: %s", request.cred_def_id)
         
         # 構建 filter
         filter_indy = V20CredFilterIndy(cred_def_id=request.cred_def_id)
         cred_filter = V20CredFilter(indy=filter_indy)
         
-        # 構建屬性列表
-        attributes = [
-            V20CredAttrSpec(name=attr.name, value=attr.value)
-            for attr in request.credential_proposal.attributes
-        ]
-        
-        # 構建 credential preview（V20CredPreview 欄位為 type，別名 @type，與 ACA-Py 一致）
+        # 構建 credential preview（V20CredPreview 欄位為 type，別名 @type，與 ACA-Py 一致；populate_by_name 可直接用欄位名）
         cred_preview = V20CredPreview(
-            **{"type": "https://didcomm.org/issue-credential/2.0/credential-preview", "attributes": attributes}
+            type="https://didcomm.org/issue-credential/2.0/credential-preview",
+            attributes=request.credential_proposal.attributes
         )
         
-        # 發送憑證（逾時避免永久卡住、前端 Sending... 不消失）
+        # 構建 offer 請求
         body = V20CredOfferRequest(
             connection_id=request.connection_id,
             filter=cred_filter,
@@ -129,29 +192,52 @@ async def send_credential(request: SendCredentialRequest):
             comment=request.comment
         )
 
-        try:
-            result = await asyncio.wait_for(
-                client.issue_credential_v2_0.send_offer_free(body=body),
-                timeout=SEND_CREDENTIAL_TIMEOUT_SEC,
-            )
-        except asyncio.TimeoutError:
-            logger.error("Send credential timed out (ACA-Py/Ledger slow or unresponsive)")
-            raise HTTPException(
-                status_code=504,
-                detail=f"Send credential timed out after {SEND_CREDENTIAL_TIMEOUT_SEC}s. Check ACA-Py and connection state.",
-            )
-
-        logger.info(f"✓ Credential sent successfully: {result.cred_ex_id if hasattr(result, 'cred_ex_id') else 'N/A'}")
-
-        return result.to_dict()
+        # ACA-Py 與 Ledger 可能很慢，改在背景工作中送出，請求立即回傳 job_id 不佔住 worker
+        job_id = uuid.uuid4().hex
+        task = asyncio.create_task(_send_offer(client, body))
+        task.add_done_callback(lambda t: _finish_job(job_id, t))
+        _jobs[job_id] = task
+        
+        return {"job_id": job_id, "status": "pending"}
 
     except HTTPException:
         raise
     except Exception as e:
-        logger.error(f"Failed to send credential: {e}")
+        logger.error("Failed to send credential: %s", e)
         raise HTTPException(status_code=400, detail=str(e))
 
 
+@router.get("/credentials/jobs/{job_id}")
+async def get_send_credential_job(job_id: str, response: Response):
+    """
+    查詢發送憑證工作狀態
+    
+    - 進行中: 202 {"status": "pending"}
+    - 完成: 200 {"status": "completed", "result": <V20CredExRecord>}
+    - 失敗: 與原本同步發送相同的錯誤狀態碼 (逾時 504，其他 400)
+    """
+    task = _jobs.get(job_id)
+    if task is None:
+        raise HTTPException(status_code=404, detail=f"Send credential job not found: {job_id}")
+    
+    if not task.done():
+        response.status_code = 202
+        return {"job_id": job_id, "status": "pending"}
+    
+    if task.cancelled():
+        raise HTTPException(status_code=400, detail="Send credential was cancelled")
+    error = task.exception()
+    if isinstance(error, asyncio.TimeoutError):
+        raise HTTPException(
+            status_code=504,
+            detail=f"Send credential timed out after {SEND_CREDENTIAL_TIMEOUT_SEC}s. Check ACA-Py and connection state.",
+        )
+    if error is not None:
+        raise HTTPException(status_code=400, detail=str(error))
+    
+    return {"job_id": job_id, "status": "completed", "result": task.result().model_dump(mode="json", by_alias=True, exclude_none=True)}
+
+
 @router.get("/credential-exchanges")
 async def get_credential_exchanges():
     """
@@ -172,14 +258,32 @@ async def get_credential_exchanges():
         client = get_client()
         result = await client.issue_credential_v2_0.get_records()
         
-        return {
-            "results": [record.to_dict() for record in result.results] if result.results else []
-        }
+        return json_response(dump_results(_CRED_EX_RECORDS, result.results))
     except Exception as e:
-        logger.error(f"Failed to get credential exchanges: {e}")
+        logger.error("Failed to get credential exchanges: %s", e)
         return {"results": []}
 
 
+async def _resolve_revocation_ids(
+    client: AcaPyClient, cred_ex_id: str, rev_reg_id: Optional[str], cred_rev_id: Optional[str]
+) -> tuple[str, str]:
+    """取得撤銷所需的 rev_reg_id 與 cred_rev_id，未提供時從交換記錄中取得"""
+    if not rev_reg_id or not cred_rev_id:
+        record: V20CredExRecordDetail = await client.issue_credential_v2_0.get_record(cred_ex_id=cred_ex_id)
+        
+        # 從記錄中提取撤銷資訊 (欄位皆定義於模型上，只需檢查 indy 是否存在)
+        if record.indy:
+            rev_reg_id = rev_reg_id or record.indy.rev_reg_id
+            cred_rev_id = cred_rev_id or record.indy.cred_rev_id
+        
+        if not rev_reg_id or not cred_rev_id:
+            raise HTTPException(
+                status_code=400,
+                detail="Credential does not support revocation or revocation info not available"
+            )
+    return rev_reg_id, cred_rev_id
+
+
 @router.post("/credentials/revoke")
 async def revoke_credential(request: RevokeCredentialRequest):
     """
@@ -198,44 +302,88 @@ async def revoke_credential(request: RevokeCredentialRequest):
     try:
         client = get_client()
         
-        logger.info(f"Revoking credential: {request.cred_ex_id}")
+        logger.info("Revoking credential: %s", request.cred_ex_id)
         
-        # 如果沒有提供 rev_reg_id 或 cred_rev_id，嘗試從交換記錄中取得
-        if not request.rev_reg_id or not request.cred_rev_id:
-            record = await client.issue_credential_v2_0.get_record(cred_ex_id=request.cred_ex_id)
-            
-            # 從記錄中提取撤銷資訊
-            if hasattr(record, 'indy') and record.indy:
-                indy_record = record.indy
-                rev_reg_id = request.rev_reg_id or (indy_record.rev_reg_id if hasattr(indy_record, 'rev_reg_id') else None)
-                cred_rev_id = request.cred_rev_id or (indy_record.cred_rev_id if hasattr(indy_record, 'cred_rev_id') else None)
-                
-                if not rev_reg_id or not cred_rev_id:
-                    raise HTTPException(
-                        status_code=400,
-                        detail="Credential does not support revocation or revocation info not available"
-                    )
-        else:
-            rev_reg_id = request.rev_reg_id
-            cred_rev_id = request.cred_rev_id
+        rev_reg_id, cred_rev_id = await _resolve_revocation_ids(
+            client, request.cred_ex_id, request.rev_reg_id, request.cred_rev_id
+        )
         
         # 執行撤銷
         # 注意: aries-cloudcontroller 可能沒有直接的 revoke 方法
         # 需要使用 revocation API
-        result = await client.revocation.revoke_credential(
-            body={
-                "rev_reg_id": rev_reg_id,
-                "cred_rev_id": cred_rev_id,
-                "publish": request.publish
-            }
-        )
+        async with _ledger_sem:
+            result = await client.revocation.revoke_credential(
+                body={
+                    "rev_reg_id": rev_reg_id,
+                    "cred_rev_id": cred_rev_id,
+                    "publish": request.publish
+                }
+            )
         
-        logger.info(f"✓ Credential revoked successfully")
+        logger.info("✓ Credential revoked successfully")
         
         return {"success": True, "result": result.to_dict() if hasattr(result, 'to_dict') else {}}
         
     except HTTPException:
         raise
     except Exception as e:
-        logger.error(f"Failed to revoke credential: {e}")
+        logger.error("Failed to revoke credential: %s", e)
         raise HTTPException(status_code=400, detail=str(e))
+
+
+@router.post("/credentials/revoke-batch")
+async def revoke_credentials_batch(request: RevokeCredentialsBatchRequest):
+    """
+    批次撤銷多張憑證
+    
+    各憑證的撤銷資訊查詢與撤銷請求同時送出 (asyncio.gather)，
+    先以 publish=False 標記為待撤銷，最後依 Revocation Registry 分組一次發布，
+    避免每張憑證各寫一次 Ledger
+    
+    單張憑證失敗不影響其他憑證，結果逐筆回傳
+    """
+    client = get_client()
+    
+    async def revoke_one(cred_ex_id: str) -> tuple[str, str]:
+        rev_reg_id, cred_rev_id = await _resolve_revocation_ids(client, cred_ex_id, None, None)
+        async with _ledger_sem:
+            await client.revocation.revoke_credential(
+                body={
+                    "rev_reg_id": rev_reg_id,
+                    "cred_rev_id": cred_rev_id,
+                    "publish": False
+                }
+            )
+        return rev_reg_id, cred_rev_id
+    
+    logger.info("Revoking %s credentials", len(request.cred_ex_ids))
+    outcomes = await asyncio.gather(
+        *(revoke_one(cred_ex_id) for cred_ex_id in request.cred_ex_ids),
+        return_exceptions=True
+    )
+    
+    results = []
+    rrid2crid: Dict[str, List[str]] = {}
+    for cred_ex_id, outcome in zip(request.cred_ex_ids, outcomes):
+        if isinstance(outcome, Exception):
+            error = outcome.detail if isinstance(outcome, HTTPException) else str(outcome)
+            logger.error("Failed to revoke credential %s: %s", cred_ex_id, error)
+            results.append({"cred_ex_id": cred_ex_id, "success": False, "error": error})
+        else:
+            rev_reg_id, cred_rev_id = outcome
+            rrid2crid.setdefault(rev_reg_id, []).append(cred_rev_id)
+            results.append({"cred_ex_id": cred_ex_id, "success": True})
+    
+    published = False
+    if request.publish and rrid2crid:
+        try:
+            async with _ledger_sem:
+                await client.revocation.publish_revocations(body=PublishRevocations(rrid2crid=rrid2crid))
+            published = True
+        except Exception as e:
+            logger.error("Failed to publish revocations: %s", e)
+            raise HTTPException(status_code=500, detail=f"Credentials revoked but publishing failed: {str(e)}")
+    
+    revoked = sum(len(cred_rev_ids) for cred_rev_ids in rrid2crid.values())
+    logger.info("✓ Revoked %s/%s credentials", revoked, len(request.cred_ex_ids))
+    return {"results": results, "published": published}
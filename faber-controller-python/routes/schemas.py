@@ -3,9 +3,10 @@ Schemas API Routes
 管理 Indy Ledger Schemas
 
 對應原 Node.js 版本的 API:
-- GET /api/schemas -> 取得 schema 列表
+- GET /api/schemas -> 取得 schema 列表 (?include_details=true 時一併取得詳情)
 - GET /api/schemas/:id -> 取得 schema 詳情
 - POST /api/admin/schema -> 創建 schema 和 credential definition
+- POST /api/admin/schemas/cache/invalidate -> 清除 schema 快取
 
 使用 aries-cloudcontroller-python 的優勢:
 1. Schema 模型自動驗證
@@ -13,28 +14,211 @@ Schemas API Routes
 3. 自動處理 schema_id 編碼
 """
 
+import asyncio
+import hashlib
 import logging
-from typing import List, Optional, Dict, Any
-from fastapi import APIRouter, HTTPException
-from pydantic import BaseModel, Field
+import sqlite3
+from concurrent.futures import ThreadPoolExecutor
+from typing import Annotated, Final, List, Optional, Dict, Tuple
+
+import orjson
+from cachetools import TTLCache
+from fastapi import APIRouter, HTTPException, Request, Response
+from pydantic import AfterValidator, BaseModel, Field, StringConstraints
 
 from aries_cloudcontroller import AcaPyClient
+from aries_cloudcontroller.exceptions import NotFoundException
 from aries_cloudcontroller.models import (
     SchemaSendRequest,
     CredentialDefinitionSendRequest,
+    SchemaGetResult,
 )
 
+from config import get_settings
+from routes.credential_definitions import invalidate_credential_definitions
+from routes.serializers import dump_model, json_response
+
 logger = logging.getLogger(__name__)
 router = APIRouter()
 
+# aries-cloudcontroller 的模型設定 defer_build，驗證/序列化器在第一次使用時才建立；
+# 匯入時先建立，第一個建立 Schema 的請求不必負擔這段成本
+for _model in (SchemaSendRequest, CredentialDefinitionSendRequest, SchemaGetResult):
+    _model.model_rebuild()
+
 # Schema 快取：Ledger 查詢慢，Schema 不可變，可安全快取以大幅縮短「Loading schema」時間
-_schema_cache: Dict[str, Any] = {}
+# 快取內容為已序列化的 JSON bytes，命中時直接回傳，不必再經過 jsonable_encoder 與 JSON 編碼
+# 限制筆數並設定存活時間，避免長時間執行或大量不同 ID 時無限制成長
+SCHEMA_CACHE_MAXSIZE = 1024
+SCHEMA_CACHE_TTL_SEC = 86400
+# 同時進行的 Schema Ledger 查詢上限 (include_details 會一次查詢所有未快取的 Schema)
+SCHEMA_FETCH_CONCURRENCY = 16
+# Schema ID 列表只會因新建 Schema 而變動 (新建時也會主動清除)，短暫快取序列化結果與 ETag
+SCHEMA_LIST_CACHE_TTL_SEC = 5
+
+# 路徑/查詢參數中的 schema_id 在解析時去除前後空白，結果即為快取鍵
+# (str.strip 在不需修剪時直接回傳原字串，不另配置新物件)
+SchemaId = Annotated[str, AfterValidator(str.strip)]
+# 修剪後不可為空，避免空白的 schema_id 被誤當成未指定
+NonEmptySchemaId = Annotated[SchemaId, StringConstraints(min_length=1)]
+
+# schema_id -> (序列化後的 JSON bytes, ETag)；ETag 在寫入快取時計算一次，命中時不必重新雜湊
+_schema_cache: Final[TTLCache[str, Tuple[bytes, str]]] = TTLCache(maxsize=SCHEMA_CACHE_MAXSIZE, ttl=SCHEMA_CACHE_TTL_SEC)
+# 單一 Schema 的內容寫入 Ledger 後不再變動，允許瀏覽器與反向代理長期快取
+SCHEMA_CACHE_CONTROL = "public, max-age=31536000, immutable"
+# "ids" -> (JSON bytes, ETag)
+_schema_list_cache: Final[TTLCache[str, Tuple[bytes, str]]] = TTLCache(maxsize=1, ttl=SCHEMA_LIST_CACHE_TTL_SEC)
+# 進行中的 Ledger 查詢 (schema_id -> Task)：同一個未快取 ID 的並行請求共用一次查詢 (single-flight)
+_inflight: Final[Dict[str, "asyncio.Task[Tuple[bytes, str]]"]] = {}
+_fetch_sem = asyncio.Semaphore(SCHEMA_FETCH_CONCURRENCY)
+
+# 磁碟快取 (SQLite)：Schema 不可變，重啟後記憶體快取未命中時先讀磁碟，不必重新查詢 Ledger
+# 所有 SQLite 操作都在單一執行緒中執行，不阻塞 event loop，也不必處理跨執行緒共用連線
+_disk_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="schema-cache")
+_disk: Optional[sqlite3.Connection] = None
+
+
+# 全域客戶端將由 main.py 注入
+_client: AcaPyClient = None
+
+
+def set_client(client: AcaPyClient):
+    """設定 ACA-Py 客戶端"""
+    global _client
+    _client = client
 
 
 def get_client() -> AcaPyClient:
-    """取得 ACA-Py 客戶端"""
-    from main import get_acapy_client
-    return get_acapy_client()
+    """取得 ACA-Py 客戶端 (由 main.py lifespan 透過 set_client 注入)"""
+    return _client
+
+
+def _disk_conn() -> Optional[sqlite3.Connection]:
+    """取得磁碟快取連線 (第一次使用時建立)；未設定路徑時回傳 None"""
+    global _disk
+    if _disk is None:
+        path = get_settings().schema_cache_db
+        if not path:
+            return None
+        _disk = sqlite3.connect(path, check_same_thread=False)
+        _disk.execute("CREATE TABLE IF NOT EXISTS schemas (id TEXT PRIMARY KEY, body BLOB NOT NULL)")
+    return _disk
+
+
+def _disk_get(cache_key: str) -> Optional[bytes]:
+    conn = _disk_conn()
+    if conn is None:
+        return None
+    row = conn.execute("SELECT body FROM schemas WHERE id = ?", (cache_key,)).fetchone()
+    return row[0] if row else None
+
+
+def _disk_put(cache_key: str, payload: bytes):
+    conn = _disk_conn()
+    if conn is not None:
+        with conn:
+            conn.execute("INSERT OR REPLACE INTO schemas (id, body) VALUES (?, ?)", (cache_key, payload))
+
+
+def _disk_delete(cache_key: Optional[str]):
+    """刪除指定 Schema 的磁碟快取，未指定時清除全部"""
+    conn = _disk_conn()
+    if conn is not None:
+        with conn:
+            if cache_key is None:
+                conn.execute("DELETE FROM schemas")
+            else:
+                conn.execute("DELETE FROM schemas WHERE id = ?", (cache_key,))
+
+
+def _disk_close():
+    global _disk
+    if _disk is not None:
+        _disk.close()
+        _disk = None
+
+
+async def close_disk_cache():
+    """
+    關閉磁碟快取 (由 main.py lifespan 在關閉時呼叫)
+    先在快取執行緒中關閉連線，排在其前的寫入會先完成，再結束執行緒
+    """
+    await _run_disk(_disk_close)
+    _disk_executor.shutdown(wait=True)
+
+
+async def _run_disk(fn, *args):
+    """在磁碟快取執行緒中執行 SQLite 操作；磁碟快取只是加速用途，失敗時記錄後忽略"""
+    try:
+        return await asyncio.get_running_loop().run_in_executor(_disk_executor, fn, *args)
+    except sqlite3.Error as e:
+        logger.warning("Schema disk cache unavailable: %s", e)
+        return None
+
+
+def _etag(body: bytes) -> str:
+    """以內容雜湊產生 ETag"""
+    return '"%s"' % hashlib.blake2b(body, digest_size=16).hexdigest()
+
+
+def _cache_schema(schema_id: str, payload: bytes) -> Tuple[bytes, str]:
+    """將 Schema 的 JSON bytes 連同其 ETag 寫入記憶體快取"""
+    entry = _schema_cache[schema_id] = (payload, _etag(payload))
+    return entry
+
+
+async def _load_schema(schema_id: str) -> Tuple[bytes, str]:
+    """
+    依序從磁碟快取、Ledger 取得 Schema 並寫入快取，
+    完成後 (不論成功與否) 自進行中查詢表移除
+    """
+    try:
+        payload = await _run_disk(_disk_get, schema_id)
+        if payload is not None:
+            logger.debug("Schema disk cache hit: %s", schema_id)
+            return _cache_schema(schema_id, payload)
+        
+        client = get_client()
+        logger.debug("Fetching schema from ledger: %s", schema_id)
+        async with _fetch_sem:
+            result = await client.schema.get_schema(schema_id=schema_id)
+        
+        # 由 pydantic-core 直接序列化為 JSON bytes，by_alias 確保欄位名稱為 attrNames 而非 attr_names
+        payload = dump_model(result)
+        entry = _cache_schema(schema_id, payload)
+        await _run_disk(_disk_put, schema_id, payload)
+        return entry
+    finally:
+        _inflight.pop(schema_id, None)
+
+
+async def _get_schema_payload(schema_id: str) -> Tuple[bytes, str]:
+    """取得 Schema 的 (JSON bytes, ETag)：優先讀快取，否則加入 (或建立) 進行中的 Ledger 查詢 (schema_id 需已去除空白)"""
+    # TTLCache.get 內部是 `in` 再 `[]` 兩次 Python 層查詢 (各自檢查過期)；命中為常態，直接取值只查一次
+    try:
+        return _schema_cache[schema_id]
+    except KeyError:
+        pass
+    
+    # 第一個請求建立查詢工作，其餘並行請求等待同一個結果 (成功或失敗)
+    task = _inflight.get(schema_id)
+    if task is None:
+        task = _inflight[schema_id] = asyncio.create_task(_load_schema(schema_id))
+    # shield: 單一請求中斷 (客戶端斷線) 不會取消其他請求共用的查詢
+    return await asyncio.shield(task)
+
+
+def _conditional_json_response(
+    request: Request, body: bytes, etag: str, cache_control: Optional[str] = None
+) -> Response:
+    """客戶端帶有相同 ETag (If-None-Match) 時回 304 不傳 body，否則回傳 JSON 與 ETag"""
+    headers = {"ETag": etag}
+    if cache_control is not None:
+        headers["Cache-Control"] = cache_control
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None and etag in (tag.strip() for tag in if_none_match.split(",")):
+        return Response(status_code=304, headers=headers)
+    return Response(content=body, media_type="application/json", headers=headers)
 
 
 class CreateSchemaRequest(BaseModel):
@@ -47,7 +231,7 @@ class CreateSchemaRequest(BaseModel):
 
 
 @router.get("/schemas")
-async def get_schemas():
+async def get_schemas(request: Request, include_details: bool = False):
     """
     取得所有已創建的 Schema ID 列表
     
@@ -56,21 +240,50 @@ async def get_schemas():
     差異:
     - 原版本: httpAsync({path: '/schemas/created'})
     - 新版本: client.schema.get_created_schemas()
+    
+    include_details=true 時同時查詢所有 Schema 詳情 (asyncio.gather 並行，結果寫入快取)，
+    以 "schemas": {schema_id: 詳情} 一併回傳，前端不必逐一請求；查詢失敗的 Schema 不列入
+    
+    回應帶有 ETag，內容未變動時對 If-None-Match 回 304
     """
+    if not include_details:
+        try:
+            body, etag = _schema_list_cache["ids"]
+        except KeyError:
+            pass
+        else:
+            return _conditional_json_response(request, body, etag)
+    
     try:
         client = get_client()
         result = await client.schema.get_created_schemas()
         
-        return {
-            "schema_ids": result.schema_ids if result.schema_ids else []
+        schema_ids = result.schema_ids if result.schema_ids else []
+        if not include_details:
+            body = orjson.dumps({"schema_ids": schema_ids})
+            etag = _etag(body)
+            _schema_list_cache["ids"] = (body, etag)
+            return _conditional_json_response(request, body, etag)
+        
+        entries = await asyncio.gather(
+            *(_get_schema_payload(schema_id) for schema_id in schema_ids),
+            return_exceptions=True
+        )
+        # 快取中的詳情已是 JSON bytes，以 orjson.Fragment 原樣嵌入，不必重新解析
+        schemas = {
+            schema_id: orjson.Fragment(entry[0])
+            for schema_id, entry in zip(schema_ids, entries)
+            if not isinstance(entry, BaseException)
         }
+        body = orjson.dumps({"schema_ids": schema_ids, "schemas": schemas})
+        return _conditional_json_response(request, body, _etag(body))
     except Exception as e:
-        logger.error(f"Failed to get schemas: {e}")
-        return {"schema_ids": []}
+        logger.error("Failed to get schemas: %s", e)
+        return json_response(b'{"schema_ids":[]}')
 
 
 @router.get("/schemas/{schema_id:path}")
-async def get_schema(schema_id: str):
+async def get_schema(schema_id: SchemaId, request: Request):
     """
     取得指定 Schema 的詳細資訊（含快取，避免重複 Ledger 查詢造成長時間 Loading）
     
@@ -81,32 +294,36 @@ async def get_schema(schema_id: str):
     - 新版本: aries-cloudcontroller 自動處理編碼和型別轉換，並快取結果
     
     注意: 確保返回的資料結構包含 attrNames，供前端讀取 schema.attrNames
+    
+    Schema 不可變，回應標示為 immutable 供瀏覽器/代理快取，並支援 If-None-Match 回 304
     """
-    cache_key = schema_id.strip()
-    if cache_key in _schema_cache:
-        logger.info(f"Schema cache hit: {cache_key}")
-        cached = _schema_cache[cache_key]
-        return cached
-
     try:
-        client = get_client()
-        logger.info(f"Fetching schema from ledger: {schema_id}")
-        result = await client.schema.get_schema(schema_id=schema_id)
-        
-        # 使用 by_alias=True 確保返回 JSON 格式的欄位名稱（attrNames 而非 attr_names）
-        data = result.to_dict()
-        
-        # 調試日誌：檢查返回的資料結構
-        logger.info(f"Schema data keys: {data.keys()}")
-        if "schema" in data:
-            logger.info(f"Schema.schema keys: {data['schema'].keys()}")
-            logger.info(f"Schema attrNames: {data['schema'].get('attrNames', 'NOT FOUND')}")
-        
-        _schema_cache[cache_key] = data
-        return data
+        payload, etag = await _get_schema_payload(schema_id)
+    except NotFoundException:
+        # 預期內的錯誤 (例如輸入錯誤的 ID)，不需要 traceback
+        logger.info("Schema not found: %s", schema_id)
+        raise HTTPException(status_code=404, detail=f"Schema not found: {schema_id}")
     except Exception as e:
-        logger.error(f"Failed to get schema {schema_id}: {e}", exc_info=True)
+        logger.error("Failed to get schema %s: %s", schema_id, e, exc_info=True)
         raise HTTPException(status_code=404, detail=f"Schema not found: {schema_id}. Error: {str(e)}")
+    return _conditional_json_response(request, payload, etag, SCHEMA_CACHE_CONTROL)
+
+
+@router.post("/admin/schemas/cache/invalidate")
+async def invalidate_schema_cache(schema_id: Optional[NonEmptySchemaId] = None):
+    """
+    清除 Schema 快取 (記憶體與磁碟，例如開發環境重置 Ledger 後)
+    
+    指定 schema_id 時只清除該筆，未帶參數時清除全部；空白的 schema_id 回 422
+    """
+    if schema_id is not None:
+        invalidated = 0 if _schema_cache.pop(schema_id, None) is None else 1
+    else:
+        invalidated = len(_schema_cache)
+        _schema_cache.clear()
+    await _run_disk(_disk_delete, schema_id)
+    logger.info("Invalidated %s cached schema(s)", invalidated)
+    return json_response(orjson.dumps({"invalidated": invalidated}))
 
 
 @router.post("/admin/schema")
@@ -133,7 +350,7 @@ async def create_schema_and_cred_def(request: CreateSchemaRequest):
         client = get_client()
         
         # Step 1: 創建並發布 Schema
-        logger.info(f"Creating schema: {request.schema_name} v{request.schema_version}")
+        logger.info("Creating schema: %s v%s", request.schema_name, request.schema_version)
         
         schema_request = SchemaSendRequest(
             schema_name=request.schema_name,
@@ -141,6 +358,8 @@ async def create_schema_and_cred_def(request: CreateSchemaRequest):
             attributes=request.attributes
         )
         
+        cred_def_tag = request.tag or request.schema_name
+        
         schema_result = await client.schema.publish_schema(body=schema_request)
         
         if not schema_result.sent or not schema_result.sent.schema_id:
@@ -150,12 +369,19 @@ async def create_schema_and_cred_def(request: CreateSchemaRequest):
             )
         
         schema_id = schema_result.sent.schema_id
-        logger.info(f"✓ Schema created: {schema_id}")
+        logger.info("✓ Schema created: %s", schema_id)
+        _schema_list_cache.clear()
         
-        # Step 2: 創建 Credential Definition
-        logger.info(f"Creating credential definition for schema: {schema_id}")
+        # 發布結果已包含 schema 內容，直接寫入快取，前端隨後查詢時不必再讀 Ledger
+        # 磁碟寫入與下方的 Credential Definition 發布同時進行，不佔用 Ledger 往返時間
+        disk_write = None
+        if schema_result.sent.var_schema:
+            payload = dump_model(SchemaGetResult(schema=schema_result.sent.var_schema))
+            _cache_schema(schema_id, payload)
+            disk_write = asyncio.create_task(_run_disk(_disk_put, schema_id, payload))
         
-        cred_def_tag = request.tag or request.schema_name
+        # Step 2: 創建 Credential Definition（依賴 schema_id，無法與 Step 1 並行）
+        logger.info("Creating credential definition for schema: %s", schema_id)
         
         cred_def_request = CredentialDefinitionSendRequest(
             schema_id=schema_id,
@@ -163,9 +389,13 @@ async def create_schema_and_cred_def(request: CreateSchemaRequest):
             support_revocation=request.support_revocation
         )
         
-        cred_def_result = await client.credential_definition.publish_cred_def(
-            body=cred_def_request
-        )
+        try:
+            cred_def_result = await client.credential_definition.publish_cred_def(
+                body=cred_def_request
+            )
+        finally:
+            if disk_write is not None:
+                await disk_write
         
         if not cred_def_result.sent or not cred_def_result.sent.credential_definition_id:
             raise HTTPException(
@@ -174,16 +404,17 @@ async def create_schema_and_cred_def(request: CreateSchemaRequest):
             )
         
         cred_def_id = cred_def_result.sent.credential_definition_id
-        logger.info(f"✓ Credential Definition created: {cred_def_id}")
+        invalidate_credential_definitions()
+        logger.info("✓ Credential Definition created: %s", cred_def_id)
         
-        return {
+        return json_response(orjson.dumps({
             "schema_id": schema_id,
             "credential_definition_id": cred_def_id,
             "support_revocation": request.support_revocation
-        }
+        }))
         
     except HTTPException:
         raise
     except Exception as e:
-        logger.error(f"Failed to create schema and cred def: {e}")
+        logger.error("Failed to create schema and cred def: %s", e)
         raise HTTPException(status_code=500, detail=str(e))
@@ -0,0 +1,29 @@
+"""
+ACA-Py 記錄列表序列化
+由 pydantic-core 一次將整個模型列表寫成 JSON bytes，
+省去逐筆 to_dict() 建立中間 dict、再由 FastAPI 重新編碼的兩趟處理
+"""
+
+from typing import Any, Optional
+
+from fastapi.responses import Response
+from pydantic import BaseModel, TypeAdapter
+
+
+def dump_results(adapter: TypeAdapter, records: Optional[list], exclude: Any = None) -> bytes:
+    """
+    將記錄列表序列化為 {"results": [...]} 的 JSON bytes
+    與 to_dict() 相同使用欄位 alias 並略過 None 值
+    """
+    results = adapter.dump_json(records or [], by_alias=True, exclude_none=True, exclude=exclude)
+    return b'{"results":' + results + b"}"
+
+
+def dump_model(model: BaseModel) -> bytes:
+    """將單一記錄序列化為 JSON bytes，與 to_dict() 相同使用欄位 alias 並略過 None 值"""
+    return model.model_dump_json(by_alias=True, exclude_none=True).encode()
+
+
+def json_response(body: bytes) -> Response:
+    """以已序列化的 JSON bytes 建立回應"""
+    return Response(content=body, media_type="application/json")